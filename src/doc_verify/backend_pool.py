@@ -0,0 +1,121 @@
+# backend_pool.py
+import os
+from contextlib import asynccontextmanager, nullcontext
+
+import aiohttp
+
+# Connector pool sizing for the Spring Boot bridge. Override via environment.
+POOL_LIMIT = int(os.environ.get("BACKEND_POOL_LIMIT", "100"))
+POOL_LIMIT_PER_HOST = int(os.environ.get("BACKEND_POOL_LIMIT_PER_HOST", "50"))
+KEEPALIVE_TIMEOUT = float(os.environ.get("BACKEND_KEEPALIVE_TIMEOUT", "30"))
+DNS_TTL = int(os.environ.get("BACKEND_DNS_TTL", "300"))
+
+# Per-tool timeouts (seconds). Uploads get more headroom than the PII lookups.
+DEFAULT_TIMEOUT = aiohttp.ClientTimeout(total=30, connect=5)
+TOOL_TIMEOUTS = {
+    "verify_bank_statement": aiohttp.ClientTimeout(total=120, connect=5, sock_read=60),
+    "fetch_bank_statement": aiohttp.ClientTimeout(total=15, connect=5),
+    "verify_credit_report": aiohttp.ClientTimeout(total=15, connect=5),
+}
+
+
+class BackendPool:
+    """
+    A single long-lived aiohttp session shared by every tool on the server.
+    Keeps connections alive between calls and caches DNS lookups.
+    """
+
+    def __init__(self, base_url, limit=POOL_LIMIT, limit_per_host=POOL_LIMIT_PER_HOST,
+                 keepalive_timeout=KEEPALIVE_TIMEOUT, dns_ttl=DNS_TTL, timeouts=None, metrics=None, tracer=None):
+        self.base_url = base_url.rstrip("/")
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.dns_ttl = dns_ttl
+        self.timeouts = dict(TOOL_TIMEOUTS if timeouts is None else timeouts)
+        # Optional ToolMetrics; backend latency is recorded per endpoint
+        self.metrics = metrics
+        # Optional Tracer; each request becomes a span under the calling tool's span
+        self.tracer = tracer
+        self._session = None
+        self._connector = None
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.total_requests = 0
+        self.total_errors = 0
+
+    async def start(self):
+        if self._session is not None:
+            return
+        self._connector = aiohttp.TCPConnector(
+            limit=self.limit,
+            limit_per_host=self.limit_per_host,
+            keepalive_timeout=self.keepalive_timeout,
+            ttl_dns_cache=self.dns_ttl,
+            use_dns_cache=True,
+        )
+        self._session = aiohttp.ClientSession(connector=self._connector, timeout=DEFAULT_TIMEOUT)
+        print(f"DOC_SERVER: Backend pool started (limit={self.limit}, per_host={self.limit_per_host})")
+
+    async def close(self):
+        if self._session is None:
+            return
+        await self._session.close()
+        self._session = None
+        self._connector = None
+        print("DOC_SERVER: Backend pool closed.")
+
+    @property
+    def session(self):
+        if self._session is None:
+            raise RuntimeError("Backend pool has not been started")
+        return self._session
+
+    @asynccontextmanager
+    async def request(self, method, path, tool_name=None, **kwargs):
+        """
+        Issues a request against the backend on the shared session,
+        applying the timeout configured for the calling tool. The time
+        recorded covers the whole exchange, including reading the body.
+        """
+        kwargs.setdefault("timeout", self.timeouts.get(tool_name, DEFAULT_TIMEOUT))
+        self.total_requests += 1
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        endpoint = self.metrics.backend_endpoint(f"{method} {path}") if self.metrics else None
+        started = endpoint.begin() if endpoint else None
+        failed = False
+        span = self.tracer.span(f"backend {method} {path}") if self.tracer else nullcontext()
+        try:
+            with span:
+                async with self.session.request(method, f"{self.base_url}{path}", **kwargs) as response:
+                    yield response
+        except Exception:
+            self.total_errors += 1
+            failed = True
+            raise
+        finally:
+            self.in_flight -= 1
+            if endpoint:
+                endpoint.end(started, failed)
+
+    def stats(self):
+        """Returns pool utilization counters for sizing the connector."""
+        connector = self._connector
+        # aiohttp does not expose these publicly; read them defensively.
+        acquired = len(getattr(connector, "_acquired", ())) if connector else 0
+        idle = sum(len(c) for c in getattr(connector, "_conns", {}).values()) if connector else 0
+        return {
+            "started": self._session is not None,
+            "limit": self.limit,
+            "limit_per_host": self.limit_per_host,
+            "keepalive_timeout": self.keepalive_timeout,
+            "dns_ttl": self.dns_ttl,
+            "connections_in_use": acquired,
+            "connections_idle": idle,
+            "utilization": acquired / self.limit if self.limit else 0.0,
+            "in_flight": self.in_flight,
+            "peak_in_flight": self.peak_in_flight,
+            "total_requests": self.total_requests,
+            "total_errors": self.total_errors,
+        }
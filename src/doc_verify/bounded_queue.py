@@ -0,0 +1,285 @@
+# bounded_queue.py
+import asyncio
+import heapq
+import math
+import itertools
+import json
+import os
+import time
+from collections import OrderedDict, deque
+
+POLICY_BLOCK = "block"
+POLICY_SPILL = "spill"
+DEFAULT_PRIORITY = 5
+# Spill file names hold the priority as three digits, so it must stay in this range.
+MIN_PRIORITY = 0
+MAX_PRIORITY = 999
+
+
+def clamp_priority(priority):
+    """Coerces a job priority to an int in [MIN_PRIORITY, MAX_PRIORITY]; junk gets DEFAULT_PRIORITY."""
+    if isinstance(priority, bool) or not isinstance(priority, (int, float)) or not math.isfinite(priority):
+        return DEFAULT_PRIORITY
+    return min(MAX_PRIORITY, max(MIN_PRIORITY, int(priority)))
+
+
+class ExpiringSet:
+    """
+    A bounded set with LRU eviction and a per-entry TTL. Used to dedupe
+    job ids without letting the set grow for the life of the process.
+    """
+
+    def __init__(self, max_entries=100_000, ttl=24 * 3600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+
+    def _purge(self, now):
+        while self._entries:
+            key, added_at = next(iter(self._entries.items()))
+            if now - added_at < self.ttl:
+                break
+            self._entries.popitem(last=False)
+
+    def __contains__(self, key):
+        added_at = self._entries.get(key)
+        if added_at is None:
+            return False
+        if time.monotonic() - added_at >= self.ttl:
+            del self._entries[key]
+            return False
+        return True
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add(self, key):
+        now = time.monotonic()
+        self._entries[key] = now
+        self._entries.move_to_end(key)
+        self._purge(now)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def update(self, keys):
+        for key in keys:
+            self.add(key)
+
+
+class BoundedJobQueue:
+    """
+    A capacity-bounded priority queue of jobs. Lower priority values are
+    served first; equal priorities are FIFO. When full, producers either
+    block (POLICY_BLOCK) or spill the overflow to disk (POLICY_SPILL) and
+    it is reloaded as space frees up. The consumer side has the same
+    get()/get_nowait()/qsize() surface as asyncio.Queue.
+    """
+
+    def __init__(self, capacity=10_000, full_policy=POLICY_BLOCK, spill_directory=None):
+        if full_policy not in (POLICY_BLOCK, POLICY_SPILL):
+            raise ValueError(f"Unknown queue full policy: {full_policy}")
+        if full_policy == POLICY_SPILL and not spill_directory:
+            raise ValueError("A spill directory is required for the spill policy")
+        self.capacity = capacity
+        self.full_policy = full_policy
+        self.spill_directory = spill_directory
+        self._queue = asyncio.PriorityQueue(maxsize=capacity)
+        self._seq = itertools.count()
+        self._spilled = [] # heap of (priority, seq, path)
+        self._refill_task = None
+        # Metrics
+        self.total_enqueued = 0
+        self.total_dequeued = 0
+        self.total_spilled = 0
+        self.blocked_puts = 0
+        self.blocked_seconds = 0.0
+        self.max_depth = 0
+        self._wait_times = deque(maxlen=1000)
+
+    # --- producer side (called from watcher threads) ---
+
+    def put_threadsafe(self, loop, jobs):
+        """
+        Enqueues (priority, job) pairs from a non-event-loop thread. Under the
+        block policy this blocks the calling thread until every job fits.
+        """
+        entries = [(clamp_priority(priority), next(self._seq), time.time(), job) for priority, job in jobs]
+        if self.full_policy == POLICY_BLOCK:
+            started = time.monotonic()
+            asyncio.run_coroutine_threadsafe(self._offer(entries, block=True), loop).result()
+            waited = time.monotonic() - started
+            if waited > 0.01:
+                self.blocked_puts += 1
+                self.blocked_seconds += waited
+            return
+        overflow = asyncio.run_coroutine_threadsafe(self._offer(entries, block=False), loop).result()
+        if overflow:
+            spilled = [self._spill(entry) for entry in overflow]
+            loop.call_soon_threadsafe(self._register_spilled, spilled)
+
+    async def _offer(self, entries, block):
+        overflow = []
+        for entry in entries:
+            # Never jump ahead of jobs already waiting on disk.
+            if not block and (self._spilled or self._queue.full()):
+                overflow.append(entry)
+                continue
+            await self._queue.put(entry)
+            self._record_put()
+        return overflow
+
+    def _record_put(self):
+        self.total_enqueued += 1
+        self.max_depth = max(self.max_depth, self._queue.qsize())
+
+    def _spill(self, entry):
+        priority, seq, enqueued_at, job = entry
+        path = os.path.join(self.spill_directory, f"{priority:03d}-{seq:012d}.json")
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"priority": priority, "enqueued_at": enqueued_at, "job": job}, f)
+        os.replace(tmp_path, path)
+        return priority, seq, path
+
+    def _register_spilled(self, spilled):
+        for item in spilled:
+            heapq.heappush(self._spilled, item)
+        self.total_spilled += len(spilled)
+        self._schedule_refill()
+
+    def load_spilled(self):
+        """Re-registers jobs spilled by a previous run. Call from the event loop at startup."""
+        if self.full_policy != POLICY_SPILL:
+            return 0
+        os.makedirs(self.spill_directory, exist_ok=True)
+        found = []
+        with os.scandir(self.spill_directory) as entries:
+            for entry in entries:
+                if not entry.name.endswith(".json"):
+                    continue
+                try:
+                    priority, seq = (int(part) for part in entry.name[:-len(".json")].split("-"))
+                except ValueError:
+                    print(f"WATCHER_ERROR: Skipping spill file with an unexpected name: '{entry.path}'")
+                    continue
+                found.append((priority, seq, entry.path))
+        # Keep new sequence numbers ahead of anything already on disk.
+        if found:
+            self._seq = itertools.count(max(seq for _, seq, _ in found) + 1)
+        self._register_spilled(found)
+        return len(found)
+
+    def _schedule_refill(self):
+        if self._spilled and (self._refill_task is None or self._refill_task.done()):
+            self._refill_task = asyncio.get_running_loop().create_task(self._refill())
+
+    async def _refill(self):
+        while self._spilled and not self._queue.full():
+            priority, seq, path = heapq.heappop(self._spilled)
+            try:
+                record = await asyncio.to_thread(_read_and_remove, path)
+            except Exception as e:
+                print(f"WATCHER_ERROR: Could not reload spilled job '{path}': {e}")
+                continue
+            await self._queue.put((priority, seq, record["enqueued_at"], record["job"]))
+            self._record_put()
+
+    # --- consumer side (event loop) ---
+
+    def _take(self, entry):
+        _, _, enqueued_at, job = entry
+        self.total_dequeued += 1
+        self._wait_times.append(time.time() - enqueued_at)
+        self._schedule_refill()
+        return job
+
+    async def get(self):
+        return self._take(await self._queue.get())
+
+    def get_nowait(self):
+        return self._take(self._queue.get_nowait())
+
+    async def get_many(self, max_jobs, max_wait, timeout=None):
+        """
+        Waits until at least one job is ready, then keeps collecting jobs for up
+        to max_wait seconds (or until max_jobs are gathered). Returns an empty
+        list if no job arrives within `timeout` seconds (None waits forever).
+        If the caller is cancelled, everything collected so far goes back on
+        the queue.
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            entries = [await asyncio.wait_for(self._queue.get(), timeout)]
+        except asyncio.TimeoutError:
+            return []
+        deadline = loop.time() + max(0, max_wait)
+        try:
+            while len(entries) < max_jobs:
+                try:
+                    entries.append(self._queue.get_nowait())
+                    continue
+                except asyncio.QueueEmpty:
+                    pass
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    # Queue.get() leaves the item in the queue when cancelled.
+                    entries.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+        except asyncio.CancelledError:
+            self._requeue(entries)
+            raise
+        return [self._take(entry) for entry in entries]
+
+    def _requeue(self, entries):
+        # Original sequence numbers are kept, so requeued jobs stay at the front.
+        for entry in entries:
+            try:
+                self._queue.put_nowait(entry)
+            except asyncio.QueueFull:
+                if self.full_policy == POLICY_SPILL:
+                    self._register_spilled([self._spill(entry)])
+                else:
+                    asyncio.get_running_loop().create_task(self._queue.put(entry))
+
+    async def ack(self, job_id, lease_id):
+        # In-memory jobs are delivered at most once; there is no lease to settle.
+        return False
+
+    async def nack(self, job_id, lease_id, delay=0.0, error=None):
+        return False
+
+    def qsize(self):
+        return self._queue.qsize()
+
+    def stats(self):
+        waits = sorted(self._wait_times)
+
+        def percentile(p):
+            return waits[min(len(waits) - 1, int(p * len(waits)))] if waits else 0.0
+
+        return {
+            "backend": "memory",
+            "depth": self._queue.qsize(),
+            "capacity": self.capacity,
+            "max_depth": self.max_depth,
+            "full_policy": self.full_policy,
+            "spilled_pending": len(self._spilled),
+            "total_spilled": self.total_spilled,
+            "total_enqueued": self.total_enqueued,
+            "total_dequeued": self.total_dequeued,
+            "blocked_puts": self.blocked_puts,
+            "blocked_seconds": self.blocked_seconds,
+            "wait_seconds_p50": percentile(0.50),
+            "wait_seconds_p95": percentile(0.95),
+            "wait_seconds_max": waits[-1] if waits else 0.0,
+        }
+
+
+def _read_and_remove(path):
+    with open(path) as f:
+        record = json.load(f)
+    os.remove(path)
+    return record
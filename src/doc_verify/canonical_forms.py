@@ -0,0 +1,171 @@
+# canonical_forms.py
+import os
+import re
+import threading
+from collections import OrderedDict
+
+# Distinct raw strings whose canonical forms are kept per process
+CANONICAL_CACHE_SIZE = int(os.environ.get("CANONICAL_CACHE_SIZE", "65536"))
+
+# The one normalization layer for names and addresses. The orchestrator
+# compares canonical forms for equality; src/draft/Matching.py imports this
+# module and scores them with an edit similarity instead.
+STREET_SUFFIXES = {
+    "street": "st", "str": "st", "avenue": "ave", "av": "ave", "road": "rd",
+    "boulevard": "blvd", "drive": "dr", "lane": "ln", "court": "ct", "place": "pl",
+    "terrace": "ter", "parkway": "pkwy", "highway": "hwy", "circle": "cir",
+    "square": "sq", "trail": "trl", "expressway": "expy", "freeway": "fwy",
+    "crescent": "cres", "alley": "aly", "center": "ctr", "heights": "hts",
+    "mount": "mt", "point": "pt", "ridge": "rdg", "route": "rte",
+}
+UNIT_DESIGNATORS = {
+    "apartment": "apt", "suite": "ste", "unit": "unit", "floor": "fl",
+    "room": "rm", "building": "bldg", "department": "dept", "number": "apt",
+    "no": "apt", "#": "apt",
+}
+DIRECTIONALS = {
+    "north": "n", "south": "s", "east": "e", "west": "w",
+    "northeast": "ne", "northwest": "nw", "southeast": "se", "southwest": "sw",
+}
+# Only abbreviated as the last component of an address (before an optional
+# ZIP code), so street names like "Georgia Ave" are kept.
+STATES = {
+    "alabama": "al", "alaska": "ak", "arizona": "az", "arkansas": "ar", "california": "ca",
+    "colorado": "co", "connecticut": "ct", "delaware": "de", "florida": "fl", "georgia": "ga",
+    "hawaii": "hi", "idaho": "id", "illinois": "il", "indiana": "in", "iowa": "ia",
+    "kansas": "ks", "kentucky": "ky", "louisiana": "la", "maine": "me", "maryland": "md",
+    "massachusetts": "ma", "michigan": "mi", "minnesota": "mn", "mississippi": "ms",
+    "missouri": "mo", "montana": "mt", "nebraska": "ne", "nevada": "nv",
+    "new hampshire": "nh", "new jersey": "nj", "new mexico": "nm", "new york": "ny",
+    "north carolina": "nc", "north dakota": "nd", "ohio": "oh", "oklahoma": "ok",
+    "oregon": "or", "pennsylvania": "pa", "rhode island": "ri", "south carolina": "sc",
+    "south dakota": "sd", "tennessee": "tn", "texas": "tx", "utah": "ut", "vermont": "vt",
+    "virginia": "va", "washington": "wa", "west virginia": "wv", "wisconsin": "wi",
+    "wyoming": "wy", "district of columbia": "dc",
+}
+NAME_TITLES = {"mr", "mrs", "ms", "miss", "dr", "prof"}
+NAME_SUFFIXES = {"jr", "sr", "ii", "iii", "iv"}
+
+_STATE_PREFIXES = {state.split()[0] for state in STATES if " " in state}
+_ADDRESS_TOKEN_MAP = {**STREET_SUFFIXES, **UNIT_DESIGNATORS, **DIRECTIONALS}
+_NON_WORD = re.compile(r"[^\w\s]")
+_ADDRESS_PUNCTUATION = re.compile(r"[^\w\s#]")
+
+
+def canonical_name_tokens(name):
+    """Lowercase, punctuation, titles and suffixes stripped; "Smith, John" becomes ("john", "smith")."""
+    text = str(name).lower()
+    if text.count(",") == 1:
+        last, rest = text.split(",")
+        if rest.strip() and rest.strip().rstrip(".") not in NAME_SUFFIXES:
+            text = f"{rest} {last}"
+    tokens = _NON_WORD.sub(" ", text).split()
+    return tuple(t for t in tokens if t not in NAME_TITLES and t not in NAME_SUFFIXES)
+
+
+def canonical_name(name):
+    return " ".join(canonical_name_tokens(name))
+
+
+def canonical_address(address):
+    """
+    Lowercase, punctuation stripped, suffixes, units and directionals
+    abbreviated, and a trailing state abbreviated.
+    """
+    words = _ADDRESS_PUNCTUATION.sub(" ", str(address).lower()).replace("#", " # ").split()
+    state_end = len(words)
+    while state_end and words[state_end - 1].isdigit():
+        state_end -= 1
+    tokens = []
+    i = 0
+    while i < len(words):
+        word = words[i]
+        token = None
+        if word in _STATE_PREFIXES:
+            for width in (3, 2):
+                phrase = " ".join(words[i:i + width])
+                if i + width == state_end and phrase in STATES:
+                    token, i = STATES[phrase], i + width
+                    break
+        if token is None:
+            token = _ADDRESS_TOKEN_MAP.get(word) or (STATES.get(word, word) if i + 1 == state_end else word)
+            i += 1
+        # "Apt #4B" would otherwise read "apt apt 4b"
+        if token == "apt" and tokens and tokens[-1] in ("apt", "ste", "unit"):
+            continue
+        tokens.append(token)
+    return " ".join(tokens)
+
+
+def canonical_address_forms(address):
+    """(canonical address, its sorted distinct tokens) for comparing reordered addresses."""
+    canonical = canonical_address(address)
+    return canonical, " ".join(sorted(set(canonical.split())))
+
+
+class CanonicalFormCache:
+    """
+    Bounded LRU of canonical name and address forms. Repeat customers and
+    shared addresses (apartment buildings) keep coming back, so each
+    distinct string is canonicalized once per process. Safe to share
+    between threads.
+    """
+
+    def __init__(self, max_entries=CANONICAL_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict() # (kind, raw) -> canonical
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _lookup(self, kind, value, canonicalize):
+        key = (kind, value)
+        canonical = self._entries.get(key)
+        if canonical is not None:
+            try:
+                self._entries.move_to_end(key)
+            except KeyError: # Evicted by another thread meanwhile
+                pass
+            self.hits += 1
+            return canonical
+        self.misses += 1
+        canonical = canonicalize(value)
+        with self._lock:
+            self._entries[key] = canonical
+            if len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return canonical
+
+    def name(self, value):
+        return " ".join(self.name_tokens(value))
+
+    def name_tokens(self, value):
+        return self._lookup("name", value, canonical_name_tokens)
+
+    def address(self, value):
+        return self.address_forms(value)[0]
+
+    def address_forms(self, value):
+        """(canonical address, sorted distinct tokens)."""
+        return self._lookup("address", value, canonical_address_forms)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+        }
+
+
+canonical_forms = CanonicalFormCache()
@@ -0,0 +1,44 @@
+# customer_data.py
+import json
+
+# Field order of the backend's CustomerData record, which is also the order of its JSON response
+CUSTOMER_DATA_FIELDS = ("firstName", "lastName", "address")
+
+
+class NotCustomerData(ValueError):
+    """The document is not a plain CustomerData JSON object; let the backend decide."""
+
+
+def parse_customer_data(raw):
+    """
+    Parses a JSON bank statement the way the backend's
+    VerificationService.parseBankStatement does, returning the same
+    {"firstName", "lastName", "address"} shape (missing fields are null).
+
+    Only documents the backend would accept unchanged are parsed here:
+    a JSON object whose keys are all CustomerData fields and whose values
+    are strings or null. Anything else (unknown fields, coerced numbers,
+    malformed JSON) raises NotCustomerData so the caller can defer to the
+    backend and keep its exact behaviour, errors included.
+    """
+    try:
+        document = json.loads(raw.decode("utf-8-sig"))
+    except (UnicodeDecodeError, ValueError) as e:
+        raise NotCustomerData(f"Not valid JSON: {e}") from None
+    if not isinstance(document, dict):
+        raise NotCustomerData("Not a JSON object")
+    unknown = set(document) - set(CUSTOMER_DATA_FIELDS)
+    if unknown:
+        raise NotCustomerData(f"Unknown fields: {sorted(unknown)}")
+    result = {}
+    for field in CUSTOMER_DATA_FIELDS:
+        value = document.get(field)
+        if value is not None and not isinstance(value, str):
+            raise NotCustomerData(f"Field '{field}' is not a string")
+        result[field] = value
+    return result
+
+
+def customer_name(data):
+    """"First Last" from a CustomerData response; empty when both parts are missing."""
+    return " ".join(part for part in (data.get("firstName"), data.get("lastName")) if part)
@@ -1,70 +1,247 @@
+import asyncio
 import json
+import os
+from contextlib import asynccontextmanager
+
 import aiohttp
 from fastmcp import FastMCP
 
-mcp = FastMCP("RealDocumentVerificationServer")
+from backend_pool import BackendPool
+from customer_data import NotCustomerData, parse_customer_data
+from result_cache import ResultCache, make_key, normalize_ssn, normalize_text
+from single_flight import SingleFlight
+from tool_metrics import ToolMetrics, add_metrics_route
+from tracing import Tracer
+from uploads import hash_file, open_upload
+
 SPRING_BOOT_BASE_URL = "http://localhost:8080"
+# Tools report failures as {"error": ...} payloads rather than raising
+metrics = ToolMetrics("doc_server", failed=lambda result: result.startswith('{"error": '))
+tracer = Tracer("doc_server")
+backend = BackendPool(SPRING_BOOT_BASE_URL, metrics=metrics, tracer=tracer)
+result_cache = ResultCache()
+in_flight = SingleFlight()
+# Default cap on backend calls in flight per batch tool call.
+BATCH_CONCURRENCY = int(os.environ.get("BATCH_CONCURRENCY", "16"))
+# JSON bank statements are parsed in-process; only PDFs (and JSON we can't vouch for) go to the backend.
+LOCAL_JSON_PARSING = os.environ.get("LOCAL_JSON_PARSING", "1") != "0"
+LOCAL_JSON_MAX_BYTES = int(os.environ.get("LOCAL_JSON_MAX_BYTES", str(1024 * 1024)))
+bank_statement_stats = {"parsed_locally": 0, "sent_to_backend": 0}
 
-@mcp.tool
-async def verify_bank_statement(file_path: str) -> str:
+@asynccontextmanager
+async def lifespan(server):
+    # One shared session for the life of the server instead of one per call.
+    await backend.start()
+    try:
+        yield
+    finally:
+        await backend.close()
+        result_cache.close()
+
+mcp = FastMCP("RealDocumentVerificationServer", lifespan=lifespan)
+add_metrics_route(mcp, metrics)
+
+async def _parse_json_statement(f, chunks):
     """
-    Reads a local file (PDF or JSON) and sends it to the Spring Boot backend
-    for verification, returning the extracted data.
+    Reads a small JSON statement and parses it as CustomerData. Returns
+    (result, body); result is None when the backend should handle the file,
+    and body is what is left to upload (the bytes already read, or the
+    untouched chunk stream for files too large to read into memory).
     """
-    print(f"DOC_SERVER: Sending file '{file_path}' to Java backend...")
+    if os.fstat(f.fileno()).st_size > LOCAL_JSON_MAX_BYTES:
+        return None, chunks
+    body = b"".join([chunk async for chunk in chunks])
+    try:
+        return parse_customer_data(body), body
+    except NotCustomerData as e:
+        print(f"DOC_SERVER: Deferring JSON statement to the backend: {e}")
+        return None, body
+
+async def _upload_bank_statement(file_path):
     try:
-        async with aiohttp.ClientSession() as session:
-            # aiohttp requires reading the file into a FormData object
+        # Stream the file in fixed-size chunks; the handle is always closed.
+        f, content_type, chunks = await open_upload(file_path)
+        try:
+            if LOCAL_JSON_PARSING and content_type == "application/json":
+                result, chunks = await _parse_json_statement(f, chunks)
+                if result is not None:
+                    bank_statement_stats["parsed_locally"] += 1
+                    print(f"DOC_SERVER: Parsed JSON bank statement '{file_path}' locally: {result}")
+                    return result
+            bank_statement_stats["sent_to_backend"] += 1
+            print(f"DOC_SERVER: Sending file '{file_path}' to Java backend...")
             data = aiohttp.FormData()
             data.add_field('file',
-                           open(file_path, 'rb'),
-                           filename=file_path.split('/')[-1],
-                           content_type='application/octet-stream') # Let the server decide content type
+                           chunks,
+                           filename=os.path.basename(file_path),
+                           content_type=content_type)
 
-            async with session.post(f"{SPRING_BOOT_BASE_URL}/verify/bank-statement", data=data) as response:
+            async with backend.request("POST", "/verify/bank-statement", "verify_bank_statement", data=data) as response:
                 response.raise_for_status() # Raise an exception for bad status codes (4xx or 5xx)
                 result = await response.json()
                 print(f"DOC_SERVER: Received bank data from backend: {result}")
-                return json.dumps(result)
+                return result
+        finally:
+            f.close()
     except Exception as e:
         print(f"DOC_SERVER_ERROR: Could not verify bank statement: {e}")
-        return json.dumps({"error": str(e)})
+        return {"error": str(e)}
 
-@mcp.tool
-async def fetch_bank_statement(firstName: str, lastName: str, address: str) -> str:
-    """
-    Calls the Spring Boot backend with PII to get a mocked bank statement.
-    """
+async def _request_bank_statement(firstName, lastName, address):
     print(f"DOC_SERVER: verifying bank statements using Java backend...")
     try:
         params = {"firstName": firstName, "lastName": lastName, "address": address}
-        async with aiohttp.ClientSession() as session:
-            async with session.get(f"{SPRING_BOOT_BASE_URL}/bank-statement", params=params) as response:
-                response.raise_for_status()
-                result = await response.json()
-                print(f"DOC_SERVER: Received credit data from backend: {result}")
-                return json.dumps(result)
+        async with backend.request("GET", "/bank-statement", "fetch_bank_statement", params=params) as response:
+            response.raise_for_status()
+            result = await response.json()
+            print(f"DOC_SERVER: Received credit data from backend: {result}")
+            return result
     except Exception as e:
         print(f"DOC_SERVER_ERROR: Could not verify bank statement: {e}")
-        return json.dumps({"error": str(e)})
-    
-@mcp.tool
-async def verify_credit_report(firstName: str, lastName: str, ssn: str) -> str:
-    """
-    Calls the Spring Boot backend with PII to get a mocked credit report.
-    """
+        return {"error": str(e)}
+
+async def _request_credit_report(firstName, lastName, ssn):
     print(f"DOC_SERVER: Getting credit report for {firstName} {lastName} from Java backend...")
     try:
         params = {"firstName": firstName, "lastName": lastName, "ssn": ssn}
-        async with aiohttp.ClientSession() as session:
-            async with session.get(f"{SPRING_BOOT_BASE_URL}/credit-report", params=params) as response:
-                response.raise_for_status()
-                result = await response.json()
-                print(f"DOC_SERVER: Received credit data from backend: {result}")
-                return json.dumps(result)
+        async with backend.request("GET", "/credit-report", "verify_credit_report", params=params) as response:
+            response.raise_for_status()
+            result = await response.json()
+            print(f"DOC_SERVER: Received credit data from backend: {result}")
+            return result
     except Exception as e:
         print(f"DOC_SERVER_ERROR: Could not get credit report: {e}")
-        return json.dumps({"error": str(e)})
+        return {"error": str(e)}
+
+async def _cached_call(key, fetch):
+    # Identical requests already in flight share one cache lookup and backend call.
+    return await in_flight.do(key, lambda: result_cache.get_or_fetch(key, fetch))
+
+async def _verify_bank_statement(file_path):
+    # Keyed on the file contents, so re-uploads under any name hit the cache.
+    try:
+        key = make_key("verify_bank_statement", sha256=await hash_file(file_path))
+    except OSError:
+        return await _upload_bank_statement(file_path) # Reports the error as before
+    return await _cached_call(key, lambda: _upload_bank_statement(file_path))
+
+async def _fetch_bank_statement(firstName, lastName, address):
+    key = make_key("fetch_bank_statement", firstName=normalize_text(firstName),
+                   lastName=normalize_text(lastName), address=normalize_text(address))
+    return await _cached_call(key, lambda: _request_bank_statement(firstName, lastName, address))
+
+async def _verify_credit_report(firstName, lastName, ssn):
+    key = make_key("verify_credit_report", firstName=normalize_text(firstName),
+                   lastName=normalize_text(lastName), ssn=normalize_ssn(ssn))
+    return await _cached_call(key, lambda: _request_credit_report(firstName, lastName, ssn))
+
+async def _run_batch(func, items, max_concurrency):
+    """
+    Fans a list of argument sets out to `func` with at most `max_concurrency`
+    calls in flight. Results keep the input order; a bad item yields an
+    error entry instead of failing the whole batch.
+    """
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+    async def run_one(index, arguments):
+        async with semaphore:
+            try:
+                return await func(**arguments)
+            except Exception as e:
+                print(f"DOC_SERVER_ERROR: Batch item {index} failed: {e}")
+                return {"error": str(e)}
+
+    print(f"DOC_SERVER: Running batch of {len(items)} items (concurrency={max_concurrency})...")
+    return await asyncio.gather(*(run_one(i, args) for i, args in enumerate(items)))
+
+@mcp.tool
+@metrics.instrument
+async def verify_bank_statement(file_path: str, traceparent: str = "") -> str:
+    """
+    Reads a local file (PDF or JSON) and returns the extracted data. JSON
+    statements are validated and parsed locally; PDFs are sent to the
+    Spring Boot backend. `traceparent` links the call to the caller's trace.
+    """
+    with tracer.span("tool verify_bank_statement", traceparent, profile=True, file_path=file_path):
+        return json.dumps(await _verify_bank_statement(file_path))
+
+@mcp.tool
+@metrics.instrument
+async def fetch_bank_statement(firstName: str, lastName: str, address: str, traceparent: str = "") -> str:
+    """
+    Calls the Spring Boot backend with PII to get a mocked bank statement.
+    """
+    with tracer.span("tool fetch_bank_statement", traceparent, profile=True):
+        return json.dumps(await _fetch_bank_statement(firstName, lastName, address))
+    
+@mcp.tool
+@metrics.instrument
+async def verify_credit_report(firstName: str, lastName: str, ssn: str, traceparent: str = "") -> str:
+    """
+    Calls the Spring Boot backend with PII to get a mocked credit report.
+    """
+    with tracer.span("tool verify_credit_report", traceparent, profile=True):
+        return json.dumps(await _verify_credit_report(firstName, lastName, ssn))
+
+@mcp.tool
+@metrics.instrument
+async def verify_bank_statements_batch(items: list[dict], max_concurrency: int = BATCH_CONCURRENCY) -> str:
+    """
+    Batch variant of verify_bank_statement. Each item is {"file_path": ...}.
+    Returns a JSON list of results in input order, with per-item errors.
+    """
+    return json.dumps(await _run_batch(_verify_bank_statement, items, max_concurrency))
+
+@mcp.tool
+@metrics.instrument
+async def fetch_bank_statements_batch(items: list[dict], max_concurrency: int = BATCH_CONCURRENCY) -> str:
+    """
+    Batch variant of fetch_bank_statement. Each item is
+    {"firstName": ..., "lastName": ..., "address": ...}.
+    Returns a JSON list of results in input order, with per-item errors.
+    """
+    return json.dumps(await _run_batch(_fetch_bank_statement, items, max_concurrency))
+
+@mcp.tool
+@metrics.instrument
+async def verify_credit_reports_batch(items: list[dict], max_concurrency: int = BATCH_CONCURRENCY) -> str:
+    """
+    Batch variant of verify_credit_report. Each item is
+    {"firstName": ..., "lastName": ..., "ssn": ...}.
+    Returns a JSON list of results in input order, with per-item errors.
+    """
+    return json.dumps(await _run_batch(_verify_credit_report, items, max_concurrency))
+
+@mcp.tool
+@metrics.instrument
+async def get_cache_stats() -> str:
+    """
+    Returns hit/miss and size statistics for the backend result cache,
+    plus how many calls were coalesced onto an identical in-flight request.
+    """
+    stats = result_cache.stats()
+    stats["single_flight"] = in_flight.stats()
+    return json.dumps(stats)
+
+@mcp.tool
+@metrics.instrument
+async def get_pool_stats() -> str:
+    """
+    Returns connection pool utilization counters for the Spring Boot backend,
+    plus how many bank statements were parsed locally instead of uploaded.
+    """
+    stats = backend.stats()
+    stats["bank_statements"] = dict(bank_statement_stats)
+    return json.dumps(stats)
+
+@mcp.tool
+async def get_metrics() -> str:
+    """
+    Returns call counts, errors, in-flight calls and latency percentiles per
+    tool, and the same for each Spring Boot backend endpoint. Tool latency
+    includes backend latency. Also served in Prometheus format at /metrics.
+    """
+    return json.dumps(metrics.snapshot())
 
 
 if __name__ == "__main__":
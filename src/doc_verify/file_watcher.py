@@ -2,55 +2,271 @@
 import asyncio
 import json
 import os
+import sys
 import threading
+import time
+from contextlib import asynccontextmanager
 from fastmcp import FastMCP
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
 
+from bounded_queue import BoundedJobQueue, ExpiringSet, DEFAULT_PRIORITY, POLICY_BLOCK, POLICY_SPILL, clamp_priority
+from sqlite_queue import SqliteJobQueue
+from tool_metrics import ToolMetrics, add_metrics_route
+from tracing import TraceContext, Tracer
+
 WATCH_DIRECTORY = "verification_jobs"
-job_queue = asyncio.Queue() # A queue to hold pending jobs
+CREDIT_SUFFIX = "_credit.json"
+BANK_SUFFIX = "_bank.json"
+# Window used to coalesce a burst of watchdog events into one batched enqueue
+COALESCE_WINDOW_SECONDS = 0.05
+# A created file with no close-after-write event is treated as complete after this long
+CLOSE_GRACE_SECONDS = 2.0
+# inotify reports close-after-write; elsewhere a created event is the best signal we get
+HAS_CLOSE_EVENTS = sys.platform.startswith("linux")
+# Queue capacity and what to do when it is full: "block" the watcher thread or "spill" to disk
+JOB_QUEUE_CAPACITY = int(os.environ.get("JOB_QUEUE_CAPACITY", "10000"))
+JOB_QUEUE_FULL_POLICY = os.environ.get("JOB_QUEUE_FULL_POLICY", POLICY_BLOCK)
+SPILL_DIRECTORY = os.environ.get("JOB_QUEUE_SPILL_DIRECTORY", os.path.join(WATCH_DIRECTORY, ".spill"))
+# Bounds on the dedupe index of already-queued job ids
+DEDUPE_MAX_ENTRIES = int(os.environ.get("DEDUPE_MAX_ENTRIES", "100000"))
+DEDUPE_TTL_SECONDS = float(os.environ.get("DEDUPE_TTL_SECONDS", str(24 * 3600)))
+# Job id prefixes (e.g. "urgent-job-001") that set priority; lower is served first
+PRIORITY_PREFIXES = {"urgent": 0, "high": 2, "low": 7, "bulk": 9}
+# Whether the startup scan also opens each credit file for its "priority" field.
+# Off by default, since a large backlog would be read and parsed in full before
+# the first job is queued; scanned jobs then take their priority from the prefix.
+STARTUP_SCAN_READS_PRIORITY = os.environ.get("STARTUP_SCAN_READS_PRIORITY", "0") != "0"
+# "memory" for a per-process queue, "sqlite" for a durable queue shared between processes
+JOB_QUEUE_BACKEND = os.environ.get("JOB_QUEUE_BACKEND", "memory")
+JOB_QUEUE_SQLITE_PATH = os.environ.get("JOB_QUEUE_SQLITE_PATH", "queue/jobs.sqlite3")
+JOB_QUEUE_SQLITE_JOURNAL_MODE = os.environ.get("JOB_QUEUE_SQLITE_JOURNAL_MODE", "WAL")
+LEASE_VISIBILITY_TIMEOUT = float(os.environ.get("LEASE_VISIBILITY_TIMEOUT", "300"))
+LEASE_MAX_ATTEMPTS = int(os.environ.get("LEASE_MAX_ATTEMPTS", "5"))
+if JOB_QUEUE_BACKEND == "sqlite":
+    # Acked jobs are remembered for as long as the in-memory dedupe index remembers ids
+    job_queue = SqliteJobQueue(JOB_QUEUE_SQLITE_PATH, LEASE_VISIBILITY_TIMEOUT, LEASE_MAX_ATTEMPTS,
+                               journal_mode=JOB_QUEUE_SQLITE_JOURNAL_MODE, done_ttl=DEDUPE_TTL_SECONDS)
+else:
+    job_queue = BoundedJobQueue(JOB_QUEUE_CAPACITY, JOB_QUEUE_FULL_POLICY, SPILL_DIRECTORY) # A queue to hold pending jobs
+tracer = Tracer("file_watcher")
 
 class JobHandler(FileSystemEventHandler):
     def __init__(self, loop):
         self.loop = loop
-        self.processed_jobs = set()
+        self.processed_jobs = ExpiringSet(DEDUPE_MAX_ENTRIES, DEDUPE_TTL_SECONDS)
+        # Half-arrived jobs: job_id -> {"credit"/"bank": True once the file is complete}
+        self.partial_jobs = {}
+        # Files created but not yet closed after writing: (job_id, kind) -> created at
+        self._unclosed = {}
+        # Completed pairs waiting for the next coalesced flush
+        self._ready = []
+        self._wake = threading.Event()
+        # Guards the indexes above between the startup scan, watchdog events and the flusher.
+        self._lock = threading.Lock()
 
     def on_created(self, event):
         if event.is_directory:
             return
+        parsed = self.get_job_id(event.src_path)
+        if not parsed:
+            return
+        if not HAS_CLOSE_EVENTS:
+            self.file_ready(*parsed)
+            return
+        # The writer may still be going; wait for the close-after-write event.
+        with self._lock:
+            job_id, kind = parsed
+            if job_id not in self.processed_jobs:
+                self.partial_jobs.setdefault(job_id, {}).setdefault(kind, False)
+                self._unclosed[parsed] = time.monotonic()
 
-        job_id = self.get_job_id(event.src_path)
-        if not job_id or job_id in self.processed_jobs:
+    def on_closed(self, event):
+        if event.is_directory:
             return
+        parsed = self.get_job_id(event.src_path)
+        if parsed:
+            self.file_ready(*parsed)
+
+    def on_moved(self, event):
+        # Uploads written to a temp name and renamed into place are complete on arrival.
+        if event.is_directory:
+            return
+        parsed = self.get_job_id(event.dest_path)
+        if parsed:
+            self.file_ready(*parsed)
+
+    def file_ready(self, job_id, kind):
+        """Marks one half of a job as fully written; pairs it without touching the filesystem."""
+        with self._lock:
+            if job_id in self.processed_jobs:
+                return
+            self._unclosed.pop((job_id, kind), None)
+            kinds = self.partial_jobs.setdefault(job_id, {})
+            kinds[kind] = True
+            if kinds.get("credit") and kinds.get("bank"):
+                del self.partial_jobs[job_id]
+                self._ready.append(job_id)
+                self._wake.set()
+
+    def run_flusher(self):
+        """
+        Coalesces bursts of events into batched enqueues. Also promotes files
+        that never got a close event (e.g. moved in from outside the directory)
+        once they have been quiet for CLOSE_GRACE_SECONDS.
+        """
+        while True:
+            try:
+                self._flush_once()
+            except Exception as e:
+                # Never let one bad batch stop job detection for the life of the process.
+                print(f"WATCHER_ERROR: Flusher failed, continuing: {e}")
+                time.sleep(COALESCE_WINDOW_SECONDS)
+
+    def _flush_once(self):
+        if self._wake.wait(timeout=CLOSE_GRACE_SECONDS / 2):
+            time.sleep(COALESCE_WINDOW_SECONDS) # Let the rest of the burst land
+        with self._lock:
+            self._wake.clear()
+            now = time.monotonic()
+            stale = [key for key, created_at in self._unclosed.items()
+                     if now - created_at >= CLOSE_GRACE_SECONDS]
+        for job_id, kind in stale:
+            self.file_ready(job_id, kind)
+        with self._lock:
+            batch, self._ready = self._ready, []
+        if batch:
+            count = self.enqueue_jobs(batch)
+            print(f"WATCHER: Detected {count} complete jobs. Adding to queue.")
+
+    def enqueue_jobs(self, job_ids, read_priority=True):
+        """
+        Builds and enqueues the given jobs not seen before in a single loop
+        callback. An id is only marked processed once its job is built, and a
+        job that fails to build does not hold up the rest of the batch.
+        Without read_priority, priorities come from job id prefixes only.
+        Returns the number of jobs enqueued.
+        """
+        with self._lock:
+            new_ids = [job_id for job_id in job_ids if job_id not in self.processed_jobs]
+        jobs = []
+        for job_id in new_ids:
+            try:
+                jobs.append(self.build_job(job_id, read_priority))
+            except Exception as e:
+                print(f"WATCHER_ERROR: Could not build job '{job_id}', skipping it: {e}")
+        with self._lock:
+            # The startup scan and the flusher can race on the same id; the first claim wins.
+            jobs = [job for job in jobs if job["job_id"] not in self.processed_jobs]
+            for job in jobs:
+                job_id = job["job_id"]
+                self.processed_jobs.add(job_id)
+                self.partial_jobs.pop(job_id, None)
+                self._unclosed.pop((job_id, "credit"), None)
+                self._unclosed.pop((job_id, "bank"), None)
+        if not jobs:
+            return 0
+        # Safely put the jobs into the asyncio queue from the watchdog thread.
+        # Under the block policy this waits here until the queue has room.
+        job_queue.put_threadsafe(self.loop, [(job["priority"], job) for job in jobs])
+        return len(jobs)
 
-        credit_path = os.path.join(WATCH_DIRECTORY, f"{job_id}_credit.json")
-        bank_path = os.path.join(WATCH_DIRECTORY, f"{job_id}_bank.json")
-
-        if os.path.exists(credit_path) and os.path.exists(bank_path):
-            print(f"WATCHER: Detected complete job '{job_id}'. Adding to queue.")
-            self.processed_jobs.add(job_id)
-            
-            # This is the crucial part: define the job and the tasks it requires.
-            job_data = {
-                "job_id": job_id,
-                "tasks": [
-                    { "tool_name": "verify_credit_report", "file_path": credit_path },
-                    { "tool_name": "verify_bank_statement", "file_path": bank_path }
-                ]
-            }
-            # Safely put the job into the asyncio queue from the watchdog thread
-            self.loop.call_soon_threadsafe(job_queue.put_nowait, job_data)
+    def scan_existing(self):
+        """
+        Pairs up job files already in WATCH_DIRECTORY and bulk-enqueues the
+        complete jobs. Uses a single os.scandir pass and no per-file stat calls,
+        and only opens job files when STARTUP_SCAN_READS_PRIORITY is set.
+        """
+        credit_ids, bank_ids = set(), set()
+        with os.scandir(WATCH_DIRECTORY) as entries:
+            for entry in entries:
+                name = entry.name
+                if name.endswith(CREDIT_SUFFIX):
+                    credit_ids.add(name[:-len(CREDIT_SUFFIX)])
+                elif name.endswith(BANK_SUFFIX):
+                    bank_ids.add(name[:-len(BANK_SUFFIX)])
+        # Seed the pairing index so the missing half can complete the job live.
+        for job_id in credit_ids ^ bank_ids:
+            self.file_ready(job_id, "credit" if job_id in credit_ids else "bank")
+        return self.enqueue_jobs(sorted(credit_ids & bank_ids), read_priority=STARTUP_SCAN_READS_PRIORITY)
+
+    def build_job(self, job_id, read_priority=True):
+        credit_path, bank_path = self.get_job_paths(job_id)
+        # Every stage downstream parents its spans on the trace started here.
+        trace = TraceContext.new()
+        detected_at = time.time()
+        tracer.record_context("job.detected", trace, detected_at, detected_at, job_id=job_id)
+        # This is the crucial part: define the job and the tasks it requires.
+        return {
+            "job_id": job_id,
+            "priority": self.get_priority(job_id, credit_path if read_priority else None),
+            "tasks": [
+                { "tool_name": "verify_credit_report", "file_path": credit_path },
+                { "tool_name": "verify_bank_statement", "file_path": bank_path }
+            ],
+            "trace": {"traceparent": trace.traceparent, "detected_at": detected_at}
+        }
+
+    def get_priority(self, job_id, credit_path):
+        """
+        Priority comes from a job id prefix such as "urgent-" or "bulk-", else
+        from an optional "priority" field in the credit job file (when a
+        credit_path is given).
+        """
+        prefix = job_id.split("-", 1)[0].split("_", 1)[0].lower()
+        if prefix in PRIORITY_PREFIXES:
+            return PRIORITY_PREFIXES[prefix]
+        if credit_path is None:
+            return DEFAULT_PRIORITY
+        try:
+            with open(credit_path) as f:
+                priority = json.load(f).get("priority", DEFAULT_PRIORITY)
+        except (OSError, ValueError, AttributeError):
+            return DEFAULT_PRIORITY
+        if isinstance(priority, str):
+            return PRIORITY_PREFIXES.get(priority.lower(), DEFAULT_PRIORITY)
+        # NaN, Infinity and out-of-range numbers are clamped rather than raising
+        return clamp_priority(priority)
+
+    def get_job_paths(self, job_id):
+        prefix = os.path.join(WATCH_DIRECTORY, job_id)
+        return prefix + CREDIT_SUFFIX, prefix + BANK_SUFFIX
 
     def get_job_id(self, file_path):
+        """Returns (job_id, kind) for a job file, or None for anything else (temp names included)."""
         filename = os.path.basename(file_path)
-        if "_credit.json" in filename: return filename.replace("_credit.json", "")
-        if "_bank.json" in filename: return filename.replace("_bank.json", "")
+        if filename.endswith(CREDIT_SUFFIX): return filename[:-len(CREDIT_SUFFIX)], "credit"
+        if filename.endswith(BANK_SUFFIX): return filename[:-len(BANK_SUFFIX)], "bank"
         return None
 
 # --- MCP Server Setup ---
-mcp = FastMCP("FileWatcherServer")
+@asynccontextmanager
+async def lifespan(server):
+    # Start the watcher once the server's event loop is running, so jobs are
+    # handed to the loop that actually serves get_new_job.
+    loop = asyncio.get_running_loop()
+    if JOB_QUEUE_BACKEND == "memory" and JOB_QUEUE_FULL_POLICY == POLICY_SPILL:
+        print(f"WATCHER: Reloaded {job_queue.load_spilled()} spilled jobs from '{SPILL_DIRECTORY}'")
+    watcher_thread = threading.Thread(target=start_file_watcher, args=(loop,), daemon=True)
+    watcher_thread.start()
+    yield
+
+mcp = FastMCP("FileWatcherServer", lifespan=lifespan)
+# get_new_job(s) latency is mostly time spent waiting for a job to arrive
+metrics = ToolMetrics("file_watcher")
+add_metrics_route(mcp, metrics)
+watcher_handler = None # Set once the watcher thread starts
+
+def trace_delivery(jobs):
+    """Records how long each job waited between detection and delivery (including redeliveries)."""
+    now = time.time()
+    for job in jobs:
+        trace = job.get("trace")
+        if trace:
+            tracer.record("queue.wait", trace["traceparent"], trace["detected_at"], now, job_id=job["job_id"])
 
 @mcp.tool
+@metrics.instrument
 async def get_new_job() -> str:
     """
     Waits for a new verification job to be ready and returns its details.
@@ -58,26 +274,87 @@ async def get_new_job() -> str:
     """
     print("WATCHER: A client is waiting for a new job...")
     job = await job_queue.get()
+    trace_delivery([job])
     print(f"WATCHER: Delivering job '{job['job_id']}' to the client.")
     return json.dumps(job)
 
+@mcp.tool
+@metrics.instrument
+async def get_new_jobs(max_jobs: int = 10, max_wait_ms: int = 50, timeout_ms: int = 0) -> str:
+    """
+    Waits until at least one verification job is ready, then keeps collecting
+    jobs for up to max_wait_ms (or until max_jobs are gathered) and returns
+    them together as a JSON list. Amortizes the per-call overhead during bursts.
+    With timeout_ms, returns an empty list if no job is ready in that time, so
+    clients can stop polling without abandoning a call that holds jobs.
+    """
+    print("WATCHER: A client is waiting for new jobs...")
+    jobs = await job_queue.get_many(max_jobs, max_wait_ms / 1000, timeout_ms / 1000 if timeout_ms > 0 else None)
+    trace_delivery(jobs)
+    print(f"WATCHER: Delivering {len(jobs)} jobs to the client: {[job['job_id'] for job in jobs]}")
+    return json.dumps(jobs)
+
+@mcp.tool
+@metrics.instrument
+async def ack_job(job_id: str, lease_id: str) -> str:
+    """
+    Marks a leased job as done so it is not redelivered. Only meaningful
+    with the sqlite queue backend; returns acked=false if the lease expired.
+    """
+    acked = await job_queue.ack(job_id, lease_id)
+    print(f"WATCHER: Ack for job '{job_id}': {'ok' if acked else 'lease not held'}")
+    return json.dumps({"job_id": job_id, "acked": acked})
+
+@mcp.tool
+@metrics.instrument
+async def nack_job(job_id: str, lease_id: str, delay_seconds: float = 0.0, error: str = "") -> str:
+    """
+    Returns a leased job to the queue so it is redelivered after delay_seconds.
+    Only meaningful with the sqlite queue backend.
+    """
+    nacked = await job_queue.nack(job_id, lease_id, delay_seconds, error or None)
+    print(f"WATCHER: Nack for job '{job_id}': {'requeued' if nacked else 'lease not held'}")
+    return json.dumps({"job_id": job_id, "nacked": nacked})
+
+@mcp.tool
+@metrics.instrument
+async def get_queue_stats() -> str:
+    """
+    Returns job queue depth, capacity, spill and wait-time metrics.
+    """
+    stats = job_queue.stats()
+    stats["dedupe_entries"] = len(watcher_handler.processed_jobs) if watcher_handler else 0
+    stats["partial_jobs"] = len(watcher_handler.partial_jobs) if watcher_handler else 0
+    return json.dumps(stats)
+
+@mcp.tool
+async def get_metrics() -> str:
+    """
+    Returns call counts, errors, in-flight calls and latency percentiles per
+    tool. Also served in Prometheus format at /metrics.
+    """
+    return json.dumps(metrics.snapshot())
+
 def start_file_watcher(loop):
     if not os.path.exists(WATCH_DIRECTORY):
         os.makedirs(WATCH_DIRECTORY)
     
-    event_handler = JobHandler(loop)
+    global watcher_handler
+    event_handler = watcher_handler = JobHandler(loop)
     observer = Observer()
     observer.schedule(event_handler, WATCH_DIRECTORY, recursive=False)
     observer.start()
+    threading.Thread(target=event_handler.run_flusher, daemon=True).start()
     print(f"File watcher started in background, monitoring '{WATCH_DIRECTORY}'")
+
+    # Pick up jobs dropped while we were down. The observer is already running,
+    # so nothing landing during the scan is missed; enqueue_jobs dedupes overlap.
+    started = time.monotonic()
+    count = event_handler.scan_existing()
+    print(f"WATCHER: Startup scan queued {count} existing jobs in {time.monotonic() - started:.2f}s")
     observer.join() # This will block the thread until it's stopped
 
 if __name__ == "__main__":
-    main_loop = asyncio.get_event_loop()
-    
-    # Run the file watcher in a separate thread
-    watcher_thread = threading.Thread(target=start_file_watcher, args=(main_loop,), daemon=True)
-    watcher_thread.start()
-    
+    # The file watcher runs in a separate thread, started from the server lifespan
     print("File Watcher MCP Server is running...")
     mcp.run(transport="http", port=8001)
\ No newline at end of file
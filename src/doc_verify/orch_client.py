@@ -1,85 +1,311 @@
 # orchestrator_client.py
 import asyncio
 import json
+import os
+import signal
+import time
+from collections import deque
 from fastmcp import Client
+from fastmcp.exceptions import ToolError
+from canonical_forms import canonical_forms
+from customer_data import customer_name
+from tracing import Tracer
 WATCHER_SERVER_URL = "http://127.0.0.1:8001"
 DOCUMENT_SERVER_URL = "http://127.0.0.1:8002"
-async def main( ):
-    print("Orchestrator Client started. Waiting for jobs from the Watcher Server...")
-    while True:
+WORKER_COUNT = int(os.environ.get("ORCH_WORKERS", "4"))
+DRAIN_TIMEOUT = float(os.environ.get("ORCH_DRAIN_TIMEOUT", "30"))
+STATS_INTERVAL = float(os.environ.get("ORCH_STATS_INTERVAL", "10"))
+# Each poll drains up to JOB_BATCH_SIZE jobs that arrive within JOB_BATCH_WAIT_MS.
+JOB_BATCH_SIZE = int(os.environ.get("ORCH_JOB_BATCH_SIZE", "8"))
+JOB_BATCH_WAIT_MS = int(os.environ.get("ORCH_JOB_BATCH_WAIT_MS", "50"))
+# An idle poll returns empty after this long, which bounds how long shutdown waits on it
+JOB_POLL_TIMEOUT_MS = int(os.environ.get("ORCH_JOB_POLL_TIMEOUT_MS", "5000"))
+# Delay before a failed job leased from a durable watcher queue is redelivered
+NACK_DELAY_SECONDS = float(os.environ.get("ORCH_NACK_DELAY", "10"))
+RECONNECT_BACKOFF_MAX = 30.0
+tracer = Tracer("orchestrator")
+
+
+class PersistentClient:
+    """
+    Keeps a single MCP session open for the life of the orchestrator and
+    transparently reconnects when the connection drops. Safe to share
+    between worker coroutines.
+    """
+
+    def __init__(self, url, name):
+        self.url = url
+        self.name = name
+        self._client = None
+        self._lock = asyncio.Lock()
+        self._backoff = 1.0
+
+    async def _connect(self):
+        async with self._lock:
+            if self._client is not None and self._client.is_connected():
+                return self._client
+            await self._disconnect()
+            while True:
+                client = Client(self.url)
+                try:
+                    await client.__aenter__()
+                except Exception as e:
+                    print(f"ORCHESTRATOR: Could not connect to {self.name} ({e}). Retrying in {self._backoff:.0f}s.")
+                    await asyncio.sleep(self._backoff)
+                    self._backoff = min(self._backoff * 2, RECONNECT_BACKOFF_MAX)
+                    continue
+                print(f"ORCHESTRATOR: Connected to {self.name} at {self.url}")
+                self._client = client
+                self._backoff = 1.0
+                return client
+
+    async def _disconnect(self):
+        client, self._client = self._client, None
+        if client is not None:
+            try:
+                await client.__aexit__(None, None, None)
+            except Exception:
+                pass
+
+    async def call_tool(self, tool_name, arguments=None):
+        """Calls a tool, reconnecting and retrying once if the session is broken."""
+        for attempt in range(2):
+            client = await self._connect()
+            try:
+                return await client.call_tool(tool_name, arguments or {})
+            except ToolError:
+                raise
+            except Exception as e:
+                if attempt:
+                    raise
+                print(f"ORCHESTRATOR: Lost connection to {self.name} ({e}). Reconnecting...")
+                async with self._lock:
+                    if self._client is client:
+                        await self._disconnect()
+
+    async def close(self):
+        async with self._lock:
+            await self._disconnect()
+
+
+class ThroughputCounter:
+    """Counts finished jobs and reports jobs/sec, overall and over a sliding window."""
+
+    def __init__(self, window=60.0):
+        self.window = window
+        self.started_at = time.monotonic()
+        self.completed = 0
+        self.failed = 0
+        self.in_flight = 0
+        self._recent = deque()
+
+    def record(self, ok):
+        now = time.monotonic()
+        if ok:
+            self.completed += 1
+        else:
+            self.failed += 1
+        self._recent.append(now)
+        while self._recent and now - self._recent[0] > self.window:
+            self._recent.popleft()
+
+    def snapshot(self):
+        now = time.monotonic()
+        while self._recent and now - self._recent[0] > self.window:
+            self._recent.popleft()
+        elapsed = max(now - self.started_at, 1e-9)
+        return {
+            "completed": self.completed,
+            "failed": self.failed,
+            "in_flight": self.in_flight,
+            "jobs_per_sec": (self.completed + self.failed) / elapsed,
+            "jobs_per_sec_recent": len(self._recent) / min(self.window, elapsed),
+        }
+
+
+async def call_tool_traced(client, tool_name, arguments):
+    """Calls a tool inside an "mcp <tool>" span and hands the span on to the server as `traceparent`."""
+    with tracer.span(f"mcp {tool_name}") as span:
+        if span.traceparent:
+            arguments = dict(arguments, traceparent=span.traceparent)
+        return await client.call_tool(tool_name, arguments)
+
+
+def _read_customer_file(file_path):
+    with open(file_path, encoding="utf-8-sig") as f:
+        return json.load(f)
+
+
+async def tool_arguments(task):
+    """
+    Arguments for one job task. Bank statements are uploaded by path; the
+    credit report tool takes the customer's details, read from the job's
+    credit file (a CustomerData JSON document, optionally with "ssn").
+    """
+    if 'arguments' in task:
+        return task['arguments']
+    if task['tool_name'] != 'verify_credit_report':
+        return {"file_path": task['file_path']}
+    document = await asyncio.to_thread(_read_customer_file, task['file_path'])
+    return {"firstName": document.get('firstName') or "", "lastName": document.get('lastName') or "",
+            "ssn": document.get('ssn') or ""}
+
+
+async def process_job(job_data, doc_client):
+    job_id = job_data['job_id']
+    tasks_to_run = job_data['tasks']
+    print(f"\nORCHESTRATOR: Received job '{job_id}'. Processing {len(tasks_to_run)} tasks.")
+
+    # Dynamically create an asyncio task for each task in the job description
+    mcp_tasks = []
+    for task in tasks_to_run:
+        tool_name = task['tool_name']
+        print(f"ORCHESTRATOR: Queuing tool '{tool_name}' for file '{task.get('file_path')}'")
+        mcp_tasks.append(call_tool_traced(doc_client, tool_name, await tool_arguments(task)))
+
+    # Run all verification tasks concurrently
+    results = await asyncio.gather(*mcp_tasks)
+
+    # Process the results (the matching logic)
+    processed_results = {}
+    for i, task in enumerate(tasks_to_run):
+        # Use the tool_name to key the results dictionary
+        tool_name = task['tool_name']
+        if getattr(results[i], 'is_error', False):
+            raise RuntimeError(f"Tool '{tool_name}' failed: {results[i].content[0].text}")
+        data = json.loads(results[i].content[0].text)
+        # The document server reports backend failures as {"error": ...} instead of raising.
+        # Raise so the job is nacked and redelivered rather than acked as a mismatch.
+        if isinstance(data, dict) and 'error' in data:
+            raise RuntimeError(f"Tool '{tool_name}' failed: {data['error']}")
+        processed_results[tool_name] = data
+
+    # The comparison logic is now more generic
+    credit_data = processed_results.get('verify_credit_report', {})
+    bank_data = processed_results.get('verify_bank_statement', {})
+
+    print(f"ORCHESTRATOR: Credit Report Data: {credit_data}")
+    print(f"ORCHESTRATOR: Bank Statement Data: {bank_data}")
+
+    with tracer.span("match"):
+        # The backend returns CustomerData (firstName, lastName, address); a missing field never matches
+        credit_name, bank_name = customer_name(credit_data), customer_name(bank_data)
+        credit_address, bank_address = credit_data.get('address'), bank_data.get('address')
+        name_match = bool(credit_name and bank_name) and canonical_forms.name(credit_name) == canonical_forms.name(bank_name)
+        address_match = (bool(credit_address and bank_address)
+                         and canonical_forms.address(credit_address) == canonical_forms.address(bank_address))
+
+    print("-" * 30)
+    print(f"Verification Result for Job '{job_id}':")
+    print(f"  Name Match: {'PASS' if name_match else 'FAIL'}")
+    print(f"  Address Match: {'PASS' if address_match else 'FAIL'}")
+    print("-" * 30)
+
+
+async def settle_job(watcher_client, job_data, ok, error=None):
+    """Acks or nacks a leased job so the durable queue does not redeliver it needlessly."""
+    lease_id = job_data.get('lease_id')
+    if not lease_id:
+        return # In-memory queue: jobs are delivered at most once
+    try:
+        if ok:
+            await watcher_client.call_tool("ack_job", {"job_id": job_data['job_id'], "lease_id": lease_id})
+        else:
+            await watcher_client.call_tool("nack_job", {"job_id": job_data['job_id'], "lease_id": lease_id,
+                                                        "delay_seconds": NACK_DELAY_SECONDS, "error": error or ""})
+    except Exception as e:
+        # The lease will expire and the job will be redelivered.
+        print(f"ORCHESTRATOR: Could not settle job '{job_data['job_id']}': {e}")
+
+
+async def run_job(worker_id, job_data, watcher_client, doc_client, counter):
+    counter.in_flight += 1
+    # Jobs from an older watcher carry no trace; start one here so they are still covered.
+    traceparent = job_data.get('trace', {}).get('traceparent')
+    with tracer.span("job", traceparent, root=True, profile=True, job_id=job_data.get('job_id'), worker=worker_id) as span:
         try:
-            job_data = {
-                "job_id": "job-001",
-                "tasks": [
-                    {
-                        "tool_name": "verify_credit_report",
-                        "arguments": {
-                            "firstName": "John",
-                            "lastName": "Doe",
-                            "ssn": "999-99-9999"
-                        }
-                    },
-                    {
-                        "tool_name": "verify_bank_statement",
-                        "arguments": {  "firstName": "John",
-                            "lastName": "Doe",
-                            "address": "123 Main St, Anytown, USA"}
-                    }
-                ]
-            }
-            # Safely put the job into the asyncio queue
-            #self.loop.call_soon_threadsafe(job_queue.put_nowait, job_data)
-            # 1. Connect to the watcher server and wait for a job
-            async with Client(WATCHER_SERVER_URL) as watcher_client:
-                job_result = await watcher_client.call_tool("get_new_job")
-                job_data = json.loads(job_result.content[0].text)
-            
-            job_id = job_data['tasks_to_run'] = job_data['tasks']
-            print(f"\nORCHESTRATOR: Received job '{job_id}'. Processing {len(tasks_to_run)} tasks.")
-
-            # 2. Connect to the document server to execute the tasks
-            async with Client(DOCUMENT_SERVER_URL) as doc_client:
-                # Dynamically create an asyncio task for each task in the job description
-                mcp_tasks = []
-                for task in tasks_to_run:
-                    tool_name = task['tool_name']
-                    file_path = task['file_path']
-                    print(f"ORCHESTRATOR: Queuing tool '{tool_name}' for file '{file_path}'")
-                    mcp_tasks.append(doc_client.call_tool(tool_name, {"file_path": file_path}))
-                
-                # 3. Run all verification tasks concurrently
-                results = await asyncio.gather(*mcp_tasks)
-            
-            # 4. Process the results (the matching logic)
-            processed_results = {}
-            for i, task in enumerate(tasks_to_run):
-                # Use the tool_name to key the results dictionary
-                tool_name = task['tool_name']
-                data = json.loads(results[i].content[0].text)
-                processed_results[tool_name] = data
-
-            # The comparison logic is now more generic
-            credit_data = processed_results.get('verify_credit_report', {})
-            bank_data = processed_results.get('verify_bank_statement', {})
-
-            print(f"ORCHESTRATOR: Credit Report Data: {credit_data}")
-            print(f"ORCHESTRATOR: Bank Statement Data: {bank_data}")
-
-            name_match = credit_data.get('name', 'a').lower() == bank_data.get('name', 'b').lower()
-            address_match = credit_data.get('address', 'c').lower().replace(',', '') == bank_data.get('address', 'd').lower().replace(',', '')
-
-            print("-" * 30)
-            print(f"Verification Result for Job '{job_id}':")
-            print(f"  Name Match: {'PASS' if name_match else 'FAIL'}")
-            print(f"  Address Match: {'PASS' if address_match else 'FAIL'}")
-            print("-" * 30)
-
-        except KeyboardInterrupt:
-            print("\nORCHESTRATOR: Shutting down.")
-            break
+            await process_job(job_data, doc_client)
+            counter.record(True)
+            await settle_job(watcher_client, job_data, True)
         except Exception as e:
-            print(f"ORCHESTRATOR: An error occurred: {e}. Waiting for next job.")
-            await asyncio.sleep(5) # Wait a bit before retrying
+            counter.record(False)
+            span.set(error=str(e))
+            print(f"ORCHESTRATOR[{worker_id}]: Job '{job_data.get('job_id')}' failed: {e}")
+            await settle_job(watcher_client, job_data, False, str(e))
+        finally:
+            counter.in_flight -= 1
+
+
+async def worker(worker_id, watcher_client, doc_client, stopping, counter):
+    """
+    Pulls job batches from the watcher until shutdown is requested. A poll
+    that is already out is never cancelled, since the watcher may have
+    dequeued jobs for it; it returns within JOB_POLL_TIMEOUT_MS (plus
+    max_wait_ms once jobs arrive) and its jobs are run before the worker
+    stops. Never abandons a job mid-flight.
+    """
+    poll_args = {"max_jobs": JOB_BATCH_SIZE, "max_wait_ms": JOB_BATCH_WAIT_MS, "timeout_ms": JOB_POLL_TIMEOUT_MS}
+    while not stopping.is_set():
+        try:
+            result = await watcher_client.call_tool("get_new_jobs", poll_args)
+            jobs = json.loads(result.content[0].text)
+        except Exception as e:
+            print(f"ORCHESTRATOR[{worker_id}]: An error occurred: {e}. Waiting for next job.")
+            try: # Wait a bit before retrying, unless we are shutting down
+                await asyncio.wait_for(stopping.wait(), timeout=5)
+            except asyncio.TimeoutError:
+                pass
+            continue
+        await asyncio.gather(*(run_job(worker_id, job_data, watcher_client, doc_client, counter) for job_data in jobs))
+    print(f"ORCHESTRATOR[{worker_id}]: Worker stopped.")
+
+
+async def report_stats(counter, stopping):
+    while not stopping.is_set():
+        try:
+            await asyncio.wait_for(stopping.wait(), timeout=STATS_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+        stats = counter.snapshot()
+        canonical = canonical_forms.stats()
+        print(f"ORCHESTRATOR: {stats['completed']} done, {stats['failed']} failed, "
+              f"{stats['in_flight']} in flight, {stats['jobs_per_sec_recent']:.2f} jobs/sec "
+              f"(overall {stats['jobs_per_sec']:.2f}), canonical form cache hit rate {canonical['hit_rate']:.0%}")
+
+
+async def main(worker_count=WORKER_COUNT):
+    print(f"Orchestrator Client started with {worker_count} workers. Waiting for jobs from the Watcher Server...")
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stopping.set)
+        except (NotImplementedError, RuntimeError):
+            pass # Not supported on this platform; KeyboardInterrupt still stops us
+
+    # Sessions stay open for the life of the orchestrator and reconnect on failure.
+    watcher_client = PersistentClient(WATCHER_SERVER_URL, "watcher")
+    doc_client = PersistentClient(DOCUMENT_SERVER_URL, "document server")
+    counter = ThroughputCounter()
+
+    workers = [asyncio.create_task(worker(i, watcher_client, doc_client, stopping, counter))
+               for i in range(worker_count)]
+    reporter = asyncio.create_task(report_stats(counter, stopping))
+    try:
+        await stopping.wait()
+    finally:
+        stopping.set()
+        print(f"\nORCHESTRATOR: Shutting down. Draining {counter.in_flight} in-flight jobs...")
+        _, pending = await asyncio.wait(workers, timeout=DRAIN_TIMEOUT)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, reporter, return_exceptions=True)
+        await watcher_client.close()
+        await doc_client.close()
+        print("ORCHESTRATOR: Stopped.")
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        print("\nORCHESTRATOR: Shutting down.")
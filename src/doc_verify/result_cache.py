@@ -0,0 +1,164 @@
+# result_cache.py
+import asyncio
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+RESULT_CACHE_MAX_ENTRIES = int(os.environ.get("RESULT_CACHE_MAX_ENTRIES", "50000"))
+RESULT_CACHE_MAX_BYTES = int(os.environ.get("RESULT_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+RESULT_CACHE_TTL = float(os.environ.get("RESULT_CACHE_TTL", "3600"))
+# Leave empty to keep the cache in memory only
+RESULT_CACHE_DISK_PATH = os.environ.get("RESULT_CACHE_DISK_PATH", "")
+
+
+def normalize_text(value):
+    """Case- and whitespace-insensitive form of a PII argument."""
+    return " ".join(str(value).split()).lower()
+
+
+def normalize_ssn(value):
+    return re.sub(r"\D", "", str(value))
+
+
+def make_key(namespace, **fields):
+    """
+    Builds a cache key from already-normalized fields. The fields are hashed
+    so raw PII never ends up in memory keys or on disk.
+    """
+    digest = hashlib.sha256(json.dumps(fields, sort_keys=True).encode("utf-8")).hexdigest()
+    return f"{namespace}:{digest}"
+
+
+class _DiskTier:
+    """Optional SQLite tier so cached results survive restarts."""
+
+    def __init__(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)")
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM results WHERE key = ? AND expires_at > ?", (key, time.time())).fetchone()
+        return row
+
+    def set(self, key, value, expires_at):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results (key, value, expires_at) VALUES (?, ?, ?)", (key, value, expires_at))
+
+    def purge_expired(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM results WHERE expires_at <= ?", (time.time(),))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class ResultCache:
+    """
+    LRU + TTL cache of backend results, bounded by entry count and by the
+    serialized size of the stored values, with an optional on-disk tier.
+    Values are stored as JSON text and decoded on every hit, so callers
+    never share mutable result dicts.
+    """
+
+    def __init__(self, max_entries=RESULT_CACHE_MAX_ENTRIES, max_bytes=RESULT_CACHE_MAX_BYTES,
+                 ttl=RESULT_CACHE_TTL, disk_path=RESULT_CACHE_DISK_PATH):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict() # key -> (value_json, expires_at)
+        self._bytes = 0
+        self._disk = _DiskTier(disk_path) if disk_path else None
+        self._writes = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def _remember(self, key, value, expires_at):
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= len(old[0])
+        self._entries[key] = (value, expires_at)
+        self._bytes += len(value)
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            _, (evicted, _) = self._entries.popitem(last=False)
+            self._bytes -= len(evicted)
+            self.evictions += 1
+
+    async def get(self, key):
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry[1] > time.time():
+                self._entries.move_to_end(key)
+                self.memory_hits += 1
+                return json.loads(entry[0])
+            del self._entries[key]
+            self._bytes -= len(entry[0])
+            self.expirations += 1
+        if self._disk is not None:
+            row = await asyncio.to_thread(self._disk.get, key)
+            if row is not None:
+                self._remember(key, row[0], row[1])
+                self.disk_hits += 1
+                return json.loads(row[0])
+        self.misses += 1
+        return None
+
+    async def set(self, key, result):
+        value = json.dumps(result)
+        expires_at = time.time() + self.ttl
+        self._remember(key, value, expires_at)
+        if self._disk is not None:
+            await asyncio.to_thread(self._disk.set, key, value, expires_at)
+            self._writes += 1
+            if self._writes % 1000 == 0:
+                await asyncio.to_thread(self._disk.purge_expired)
+
+    async def get_or_fetch(self, key, fetch):
+        """Returns the cached result for key, or awaits fetch() and caches it unless it is an error."""
+        cached = await self.get(key)
+        if cached is not None:
+            return cached
+        result = await fetch()
+        if not (isinstance(result, dict) and "error" in result):
+            await self.set(key, result)
+        return result
+
+    def close(self):
+        if self._disk is not None:
+            self._disk.close()
+            self._disk = None
+
+    def stats(self):
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "ttl": self.ttl,
+            "disk_tier": self._disk is not None,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
@@ -0,0 +1,58 @@
+# single_flight.py
+import asyncio
+
+
+class _Call:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls that share a key: the first caller starts the
+    work and everyone arriving while it is in flight awaits the same result.
+    A cancelled caller only stops waiting; the shared call is cancelled only
+    when no caller is left waiting for it.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self.leaders = 0
+        self.coalesced = 0
+        self.abandoned = 0
+
+    async def do(self, key, fn):
+        call = self._calls.get(key)
+        if call is None:
+            call = self._calls[key] = _Call(asyncio.ensure_future(fn()))
+            call.task.add_done_callback(lambda _: self._forget(key, call))
+            self.leaders += 1
+        else:
+            self.coalesced += 1
+
+        call.waiters += 1
+        try:
+            # shield() keeps one caller's cancellation from reaching the shared task.
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                self.abandoned += 1
+                self._forget(key, call)
+                call.task.cancel()
+
+    def _forget(self, key, call):
+        if self._calls.get(key) is call:
+            del self._calls[key]
+
+    def stats(self):
+        return {
+            "in_flight": len(self._calls),
+            # Calls that ran fn(); with a cache in front, some were served from it
+            "leaders": self.leaders,
+            "coalesced_calls": self.coalesced,
+            "abandoned_calls": self.abandoned,
+        }
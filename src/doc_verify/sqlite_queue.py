@@ -0,0 +1,234 @@
+# sqlite_queue.py
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import deque
+
+# How often leasing also deletes 'done' jobs older than done_ttl
+PURGE_INTERVAL_SECONDS = 60.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    seq         INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id      TEXT NOT NULL UNIQUE,
+    priority    INTEGER NOT NULL,
+    payload     TEXT NOT NULL,
+    state       TEXT NOT NULL DEFAULT 'pending',
+    enqueued_at REAL NOT NULL,
+    visible_at  REAL NOT NULL,
+    lease_id    TEXT,
+    attempts    INTEGER NOT NULL DEFAULT 0,
+    last_error  TEXT,
+    completed_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (state, priority, seq, visible_at);
+"""
+
+
+class SqliteJobQueue:
+    """
+    A durable job queue backed by SQLite, shared by every watcher process
+    pointed at the same database file. Dequeue hands out a lease: the job
+    stays invisible for `visibility_timeout` seconds and is redelivered
+    unless the consumer acks it first. nack makes it visible again (after
+    an optional delay); jobs that exceed `max_attempts` are parked as dead.
+    Acked jobs are kept as 'done' for `done_ttl` seconds so that a rescan
+    of the watch directory does not enqueue them again.
+
+    WAL mode needs every process on the same host. For a queue on a shared
+    network volume use journal_mode="DELETE" instead.
+    """
+
+    def __init__(self, path, visibility_timeout=300.0, max_attempts=5,
+                 poll_interval=0.5, journal_mode="WAL", done_ttl=24 * 3600):
+        self.path = path
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self.done_ttl = done_ttl
+        self.poll_interval = poll_interval
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.execute(f"PRAGMA journal_mode={journal_mode}")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+        if "completed_at" not in columns: # Databases created before acked jobs were kept
+            self._conn.execute("ALTER TABLE jobs ADD COLUMN completed_at REAL")
+        self._last_purge = 0.0
+        # One connection shared by watcher threads and the event loop's worker threads.
+        self._lock = threading.Lock()
+        self._available = None # asyncio.Event, created on the loop
+        # Metrics
+        self.total_enqueued = 0
+        self.total_dequeued = 0
+        self.total_acked = 0
+        self.total_nacked = 0
+        self.total_redelivered = 0
+        self.total_purged = 0
+        self._wait_times = deque(maxlen=1000)
+
+    # --- producer side (called from watcher threads) ---
+
+    def put_threadsafe(self, loop, jobs):
+        """Durably enqueues (priority, job) pairs. Jobs already in the queue are skipped."""
+        now = time.time()
+        rows = [(job["job_id"], priority, json.dumps(job), now, now) for priority, job in jobs]
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                before = self._conn.total_changes
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO jobs (job_id, priority, payload, enqueued_at, visible_at) "
+                    "VALUES (?, ?, ?, ?, ?)", rows)
+                inserted = self._conn.total_changes - before
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        self.total_enqueued += inserted
+        if inserted:
+            loop.call_soon_threadsafe(self._notify)
+
+    def _notify(self):
+        if self._available is not None:
+            self._available.set()
+
+    # --- consumer side (event loop) ---
+
+    def _lease(self, max_jobs):
+        now = time.time()
+        lease_id = uuid.uuid4().hex
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Park jobs whose leases keep expiring without an ack or nack.
+                self._conn.execute(
+                    "UPDATE jobs SET state = 'dead', last_error = 'lease expired too many times' "
+                    "WHERE state = 'pending' AND visible_at <= ? AND attempts >= ?", (now, self.max_attempts))
+                if now - self._last_purge >= PURGE_INTERVAL_SECONDS:
+                    # Forget finished jobs once they are past the dedupe window.
+                    purged = self._conn.execute(
+                        "DELETE FROM jobs WHERE state = 'done' AND completed_at <= ?", (now - self.done_ttl,))
+                    self.total_purged += purged.rowcount
+                    self._last_purge = now
+                rows = self._conn.execute(
+                    "SELECT seq, payload, enqueued_at, attempts FROM jobs "
+                    "WHERE state = 'pending' AND visible_at <= ? "
+                    "ORDER BY priority, seq LIMIT ?", (now, max_jobs)).fetchall()
+                if rows:
+                    self._conn.executemany(
+                        "UPDATE jobs SET visible_at = ?, lease_id = ?, attempts = attempts + 1 WHERE seq = ?",
+                        [(now + self.visibility_timeout, lease_id, seq) for seq, _, _, _ in rows])
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        jobs = []
+        for _, payload, enqueued_at, attempts in rows:
+            job = json.loads(payload)
+            job["lease_id"] = lease_id
+            job["attempts"] = attempts + 1
+            if attempts:
+                self.total_redelivered += 1
+            self._wait_times.append(now - enqueued_at)
+            jobs.append(job)
+        self.total_dequeued += len(jobs)
+        return jobs
+
+    async def get_many(self, max_jobs, max_wait, timeout=None):
+        """
+        Leases up to max_jobs, waiting until at least one is available and then
+        for up to max_wait seconds for more. Returns an empty list if nothing is
+        available within `timeout` seconds (None waits forever). Other processes
+        and expired leases are picked up by polling every poll_interval seconds.
+        """
+        if self._available is None:
+            self._available = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        jobs = []
+        deadline = None if timeout is None else loop.time() + timeout
+        collecting = False
+        while len(jobs) < max_jobs:
+            self._available.clear()
+            jobs.extend(await asyncio.to_thread(self._lease, max_jobs - len(jobs)))
+            if jobs and not collecting:
+                collecting, deadline = True, loop.time() + max_wait
+            wait = self.poll_interval if deadline is None else min(self.poll_interval, deadline - loop.time())
+            if len(jobs) >= max_jobs or wait <= 0:
+                break
+            try:
+                await asyncio.wait_for(self._available.wait(), wait)
+            except asyncio.TimeoutError:
+                pass
+        return jobs
+
+    async def get(self):
+        return (await self.get_many(1, 0))[0]
+
+    def _settle(self, job_id, lease_id, ack, delay=0.0, error=None):
+        with self._lock:
+            if ack:
+                # Keep the row (and its UNIQUE job_id) so the job is not enqueued again.
+                cursor = self._conn.execute(
+                    "UPDATE jobs SET state = 'done', completed_at = ?, lease_id = NULL "
+                    "WHERE job_id = ? AND lease_id = ? AND state = 'pending'", (time.time(), job_id, lease_id))
+            else:
+                cursor = self._conn.execute(
+                    "UPDATE jobs SET visible_at = ?, lease_id = NULL, last_error = ?, "
+                    "state = CASE WHEN attempts >= ? THEN 'dead' ELSE 'pending' END "
+                    "WHERE job_id = ? AND lease_id = ?",
+                    (time.time() + delay, error, self.max_attempts, job_id, lease_id))
+            return cursor.rowcount == 1
+
+    async def ack(self, job_id, lease_id):
+        """Completes a leased job. Returns False if the job was re-leased to another consumer."""
+        settled = await asyncio.to_thread(self._settle, job_id, lease_id, True)
+        self.total_acked += settled
+        return settled
+
+    async def nack(self, job_id, lease_id, delay=0.0, error=None):
+        """Returns a leased job to the queue for redelivery after `delay` seconds."""
+        settled = await asyncio.to_thread(self._settle, job_id, lease_id, False, delay, error)
+        self.total_nacked += settled
+        if settled and delay <= 0:
+            self._notify()
+        return settled
+
+    def qsize(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM jobs WHERE state = 'pending'").fetchone()[0]
+
+    def stats(self):
+        now = time.time()
+        with self._lock:
+            counts = dict(self._conn.execute(
+                "SELECT CASE WHEN state = 'pending' AND visible_at > ? THEN 'invisible' ELSE state END, COUNT(*) "
+                "FROM jobs GROUP BY 1", (now,)).fetchall())
+        waits = sorted(self._wait_times)
+
+        def percentile(p):
+            return waits[min(len(waits) - 1, int(p * len(waits)))] if waits else 0.0
+
+        return {
+            "backend": "sqlite",
+            "path": self.path,
+            "depth": counts.get("pending", 0),
+            "leased_or_delayed": counts.get("invisible", 0),
+            "dead": counts.get("dead", 0),
+            "done": counts.get("done", 0),
+            "total_purged": self.total_purged,
+            "total_enqueued": self.total_enqueued,
+            "total_dequeued": self.total_dequeued,
+            "total_acked": self.total_acked,
+            "total_nacked": self.total_nacked,
+            "total_redelivered": self.total_redelivered,
+            "wait_seconds_p50": percentile(0.50),
+            "wait_seconds_p95": percentile(0.95),
+            "wait_seconds_max": waits[-1] if waits else 0.0,
+        }
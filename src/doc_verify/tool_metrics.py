@@ -0,0 +1,197 @@
+# tool_metrics.py
+import bisect
+import functools
+import os
+import time
+
+# Latency histogram bucket upper bounds in seconds (the Prometheus "le" labels).
+# Spans local JSON parsing (sub-millisecond) up to long-polling job waits.
+LATENCY_BUCKETS = tuple(float(bound) for bound in os.environ.get(
+    "METRICS_LATENCY_BUCKETS",
+    "0.0001,0.00025,0.0005,0.001,0.0025,0.005,0.01,0.025,0.05,0.1,0.25,0.5,1,2.5,5,10,30,60,120").split(","))
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4"
+
+
+class LatencyHistogram:
+    """
+    Fixed-bucket latency histogram. Recording is a bisect and an increment;
+    percentiles are estimated by interpolating inside the bucket they fall in.
+    """
+
+    __slots__ = ("bounds", "counts", "count", "sum", "max")
+
+    def __init__(self, bounds=LATENCY_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1) # The last bucket is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(self.bounds, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, fraction):
+        if not self.count:
+            return 0.0
+        rank = fraction * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                if index == len(self.bounds):
+                    return self.max
+                lower = self.bounds[index - 1] if index else 0.0
+                upper = min(self.bounds[index], self.max)
+                return lower + (upper - lower) * max(0.0, rank - seen) / count
+            seen += count
+        return self.max
+
+    def snapshot(self):
+        return {
+            "mean_ms": self.sum / self.count * 1000 if self.count else 0.0,
+            "p50_ms": self.percentile(0.50) * 1000,
+            "p95_ms": self.percentile(0.95) * 1000,
+            "p99_ms": self.percentile(0.99) * 1000,
+            "max_ms": self.max * 1000,
+        }
+
+
+class CallStats:
+    """Counters, in-flight gauge and latency histogram for one tool or backend endpoint."""
+
+    __slots__ = ("calls", "errors", "in_flight", "peak_in_flight", "latency")
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.latency = LatencyHistogram()
+
+    def begin(self):
+        self.calls += 1
+        self.in_flight += 1
+        if self.in_flight > self.peak_in_flight:
+            self.peak_in_flight = self.in_flight
+        return time.perf_counter()
+
+    def end(self, started, failed=False):
+        self.in_flight -= 1
+        if failed:
+            self.errors += 1
+        self.latency.observe(time.perf_counter() - started)
+
+    def snapshot(self):
+        stats = {
+            "calls": self.calls,
+            "errors": self.errors,
+            "in_flight": self.in_flight,
+            "peak_in_flight": self.peak_in_flight,
+        }
+        stats.update(self.latency.snapshot())
+        return stats
+
+
+class ToolMetrics:
+    """
+    Per-tool and per-backend-endpoint call metrics for one MCP server.
+    Tool time includes any backend time; comparing the two separates the
+    Spring Boot backend from our own overhead. Updated from the event loop
+    only, so no locking.
+
+    `failed(result)` flags tool results that report an error without
+    raising (the doc server returns {"error": ...} payloads).
+    """
+
+    def __init__(self, namespace, failed=None):
+        self.namespace = namespace
+        self.failed = failed
+        self.started_at = time.time()
+        self.tools = {}
+        self.backend = {}
+
+    def tool(self, name):
+        stats = self.tools.get(name)
+        if stats is None:
+            stats = self.tools[name] = CallStats()
+        return stats
+
+    def backend_endpoint(self, name):
+        stats = self.backend.get(name)
+        if stats is None:
+            stats = self.backend[name] = CallStats()
+        return stats
+
+    def instrument(self, func):
+        """Decorator recording every call of an async tool. Keeps the signature FastMCP inspects."""
+        stats = self.tool(func.__name__)
+        failed = self.failed
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            started = stats.begin()
+            is_error = False
+            try:
+                result = await func(*args, **kwargs)
+                is_error = failed is not None and failed(result)
+                return result
+            except Exception: # A cancelled long-poll is not an error
+                is_error = True
+                raise
+            finally:
+                stats.end(started, is_error)
+        return wrapper
+
+    def snapshot(self):
+        return {
+            "namespace": self.namespace,
+            "uptime_seconds": time.time() - self.started_at,
+            "tools": {name: stats.snapshot() for name, stats in self.tools.items()},
+            "backend": {name: stats.snapshot() for name, stats in self.backend.items()},
+        }
+
+    def render_prometheus(self):
+        """Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+        for kind, label, table in (("tool", "tool", self.tools), ("backend", "endpoint", self.backend)):
+            if not table:
+                continue
+            prefix = f"{self.namespace}_{kind}"
+            series = [(f'{label}="{_escape_label(name)}"', stats) for name, stats in sorted(table.items())]
+            for suffix, metric_type, help_text, value in (
+                    ("calls_total", "counter", f"Calls per {label}.", lambda stats: stats.calls),
+                    ("errors_total", "counter", f"Failed calls per {label}.", lambda stats: stats.errors),
+                    ("in_flight", "gauge", f"Calls currently in flight per {label}.", lambda stats: stats.in_flight)):
+                lines.append(f"# HELP {prefix}_{suffix} {help_text}")
+                lines.append(f"# TYPE {prefix}_{suffix} {metric_type}")
+                lines.extend(f"{prefix}_{suffix}{{{labels}}} {value(stats)}" for labels, stats in series)
+            name = f"{prefix}_duration_seconds"
+            lines.append(f"# HELP {name} Call latency per {label}.")
+            lines.append(f"# TYPE {name} histogram")
+            for labels, stats in series:
+                histogram = stats.latency
+                cumulative = 0
+                for bound, count in zip(histogram.bounds, histogram.counts):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{{{labels},le="{bound:g}"}} {cumulative}')
+                lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {histogram.count}')
+                lines.append(f"{name}_sum{{{labels}}} {histogram.sum!r}")
+                lines.append(f"{name}_count{{{labels}}} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape_label(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def add_metrics_route(mcp, metrics, path="/metrics"):
+    """Serves `metrics` in Prometheus text format on the server's HTTP transport."""
+    from starlette.responses import Response
+
+    @mcp.custom_route(path, methods=["GET"])
+    async def prometheus_metrics(request):
+        return Response(metrics.render_prometheus(), media_type=PROMETHEUS_CONTENT_TYPE)
+    return prometheus_metrics
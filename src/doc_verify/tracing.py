@@ -0,0 +1,333 @@
+# tracing.py
+import asyncio
+import atexit
+import contextvars
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+# Opt-in: set TRACE_FILE (e.g. traces/jobs.trace.json) on every process
+# (watcher, orchestrator, document server) to record spans; they all append to
+# that file. Spans go in as a Chrome trace event JSON array (the closing bracket
+# is optional), so the file opens as-is in chrome://tracing and Perfetto. It is
+# not JSON Lines: each event line ends with a comma.
+TRACE_FILE = os.environ.get("TRACE_FILE", "")
+# Fraction of jobs whose spans are recorded; the context is propagated either way
+TRACE_SAMPLE_RATE = float(os.environ.get("TRACE_SAMPLE_RATE", "1.0")) if TRACE_FILE else 0.0
+# Once the file reaches this size it is moved to TRACE_FILE.1 (replacing the
+# previous one) and a new file is started, so traces take about twice this at most.
+TRACE_MAX_BYTES = int(os.environ.get("TRACE_MAX_BYTES", str(256 * 1024 * 1024)))
+# Spans are buffered and written out per this many bytes or seconds
+TRACE_FLUSH_BYTES = 64 * 1024
+TRACE_FLUSH_INTERVAL = float(os.environ.get("TRACE_FLUSH_INTERVAL", "1.0"))
+# Opt-in: sample the stacks of traced jobs and tool calls, and keep them on spans
+# slower than this many milliseconds. 0 turns the profiler off.
+PROFILE_THRESHOLD_MS = float(os.environ.get("TRACE_PROFILE_THRESHOLD_MS", "0"))
+PROFILE_INTERVAL_MS = float(os.environ.get("TRACE_PROFILE_INTERVAL_MS", "5"))
+PROFILE_MAX_STACKS = 20
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+class TraceContext:
+    """A trace id, the id of the span to parent new work on, and the sampling decision."""
+
+    __slots__ = ("trace_id", "span_id", "sampled")
+
+    def __init__(self, trace_id, span_id, sampled):
+        self.trace_id = trace_id
+        self.span_id = span_id
+        self.sampled = sampled
+
+    @classmethod
+    def new(cls, sample_rate=TRACE_SAMPLE_RATE):
+        return cls(f"{random.getrandbits(128):032x}", _new_span_id(), random.random() < sample_rate)
+
+    @property
+    def traceparent(self):
+        """W3C traceparent form, used in job payloads and tool arguments."""
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+    @classmethod
+    def parse(cls, traceparent):
+        """Returns None for a missing or malformed traceparent."""
+        parts = traceparent.split("-") if traceparent else ()
+        if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+            return None
+        return cls(parts[1], parts[2], parts[3] == "01")
+
+
+def _new_span_id():
+    return f"{random.getrandbits(64):016x}"
+
+
+class Span:
+    __slots__ = ("name", "context", "parent_id", "args")
+
+    def __init__(self, name, context, parent_id, args):
+        self.name = name
+        self.context = context
+        self.parent_id = parent_id
+        self.args = args
+
+    @property
+    def traceparent(self):
+        return self.context.traceparent if self.context.trace_id else ""
+
+    def set(self, **args):
+        self.args.update(args)
+
+
+class Tracer:
+    """
+    Records timed spans for one service. span() nests through a context
+    variable, so work started inside a span (including asyncio tasks) is
+    parented on it; traceparent strings carry the context across processes.
+    """
+
+    def __init__(self, service, path=TRACE_FILE, profile_threshold_ms=PROFILE_THRESHOLD_MS,
+                 profile_interval_ms=PROFILE_INTERVAL_MS, max_bytes=TRACE_MAX_BYTES):
+        self.service = service
+        self.path = path or None # None: not recording
+        self.max_bytes = max_bytes
+        self.pid = os.getpid()
+        self.profile_threshold = profile_threshold_ms / 1000
+        self.profiler = SamplingProfiler(profile_interval_ms / 1000) if profile_threshold_ms > 0 else None
+        self.spans_recorded = 0
+        self.rotations = 0
+        self._fd = None
+        self._lock = threading.Lock()
+        self._buffer = []
+        self._buffered_bytes = 0
+        self._last_flush = time.monotonic()
+        if self.path:
+            atexit.register(self.flush)
+
+    @contextmanager
+    def span(self, name, parent=None, root=False, profile=False, **args):
+        """
+        Times the enclosed block. `parent` is a traceparent string or a
+        TraceContext; without one the span nests under the current span, or
+        starts a new trace when `root` is set. With nothing to attach to the
+        span is not recorded. `profile` registers the block with the sampling
+        profiler when it is enabled.
+        """
+        if isinstance(parent, str):
+            parent = TraceContext.parse(parent)
+        if parent is None:
+            current = _current_span.get()
+            parent = current.context if current is not None else (TraceContext.new() if root else None)
+            parent_id = current.context.span_id if current is not None else None
+        else:
+            parent_id = parent.span_id
+        if parent is None:
+            # Nothing to attach to
+            yield Span(name, TraceContext(None, None, False), parent_id, args)
+            return
+        if not parent.sampled or self.path is None:
+            # Keep propagating the context, but record nothing. It is still the
+            # current span, so nested spans and tool calls pass it on.
+            span = Span(name, parent, parent_id, args)
+            token = _current_span.set(span)
+            try:
+                yield span
+            finally:
+                _current_span.reset(token)
+            return
+        span = Span(name, TraceContext(parent.trace_id, _new_span_id(), True), parent_id, args)
+        token = _current_span.set(span)
+        profiling = profile and self.profiler is not None and self.profiler.begin(span)
+        start_us = time.time_ns() // 1000
+        started = time.perf_counter()
+        try:
+            yield span
+        except BaseException as e:
+            span.args["error"] = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            duration = time.perf_counter() - started
+            _current_span.reset(token)
+            if profiling:
+                stacks = self.profiler.end(span)
+                if duration >= self.profile_threshold and stacks:
+                    span.args["profile"] = {"samples": sum(stacks.values()),
+                                            "stacks": dict(stacks.most_common(PROFILE_MAX_STACKS))}
+            self._emit(span, start_us, duration)
+
+    def record(self, name, parent, started_at, ended_at, **args):
+        """Records a span measured elsewhere (epoch seconds), e.g. time spent waiting in a queue."""
+        if isinstance(parent, str):
+            parent = TraceContext.parse(parent)
+        if parent is None or not parent.sampled or self.path is None:
+            return None
+        span = Span(name, TraceContext(parent.trace_id, _new_span_id(), True), parent.span_id, args)
+        self._emit(span, int(started_at * 1_000_000), max(0.0, ended_at - started_at))
+        return span
+
+    def record_context(self, name, context, started_at, ended_at, **args):
+        """Records the span that `context` itself names, e.g. the root created when a job is detected."""
+        if context.sampled and self.path is not None:
+            self._emit(Span(name, context, None, args), int(started_at * 1_000_000), max(0.0, ended_at - started_at))
+
+    def _emit(self, span, start_us, duration):
+        context = span.context
+        event = {
+            "name": span.name,
+            "cat": self.service,
+            "ph": "X",
+            "ts": start_us,
+            "dur": int(duration * 1_000_000),
+            "pid": self.pid,
+            # One row per trace, so each job's spans stack up together in the viewer
+            "tid": int(context.trace_id[:8], 16),
+            "args": dict(span.args, trace_id=context.trace_id, span_id=context.span_id, parent_id=span.parent_id),
+        }
+        self._write(json.dumps(event, default=str) + ",\n")
+        self.spans_recorded += 1
+
+    def _write(self, line):
+        data = line.encode()
+        with self._lock:
+            self._buffer.append(data)
+            self._buffered_bytes += len(data)
+            if (self._buffered_bytes >= TRACE_FLUSH_BYTES
+                    or time.monotonic() - self._last_flush >= TRACE_FLUSH_INTERVAL):
+                self._flush_locked()
+
+    def flush(self):
+        """Writes out buffered spans; also runs at exit."""
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        self._last_flush = time.monotonic()
+        if not self._buffer:
+            return
+        data = b"".join(self._buffer)
+        self._buffer.clear()
+        self._buffered_bytes = 0
+        if self._fd is None and not self._open():
+            return
+        # One write() per batch of whole lines on an O_APPEND descriptor, so
+        # lines from several processes don't interleave.
+        try:
+            os.write(self._fd, data)
+            if os.fstat(self._fd).st_size >= self.max_bytes:
+                self._rotate()
+        except OSError as e:
+            print(f"TRACING: Could not write to '{self.path}': {e}")
+
+    def _rotate(self):
+        # Another process may have rotated the file already; only move it if
+        # this descriptor still points at it.
+        try:
+            if os.stat(self.path).st_ino == os.fstat(self._fd).st_ino:
+                os.replace(self.path, self.path + ".1")
+                print(f"TRACING: '{self.path}' reached {self.max_bytes} bytes, moved it to '{self.path}.1'")
+        except OSError:
+            pass
+        os.close(self._fd)
+        self._fd = None
+        self.rotations += 1
+
+    def _open(self):
+        if not self.path:
+            return False
+        try:
+            if os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            try:
+                fd = os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_EXCL | os.O_APPEND, 0o644)
+                os.write(fd, b"[\n") # The closing bracket is optional in the trace event format
+            except FileExistsError:
+                fd = os.open(self.path, os.O_WRONLY | os.O_APPEND)
+            name_event = {"name": "process_name", "ph": "M", "pid": self.pid, "args": {"name": self.service}}
+            os.write(fd, (json.dumps(name_event) + ",\n").encode())
+        except OSError as e:
+            print(f"TRACING: Tracing disabled, could not open '{self.path}': {e}")
+            self.path = None
+            return False
+        if not self.rotations:
+            print(f"TRACING: Writing {self.service} spans to '{self.path}'")
+        self._fd = fd
+        return True
+
+
+class SamplingProfiler:
+    """
+    Samples, from a background thread, where each profiled asyncio task is:
+    the chain of coroutines it is suspended in, extended with the thread's
+    stack when the task is the one running. The thread only runs while a
+    profiled span is open. Stacks are in collapsed form ("outer;inner").
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        self._spans = {} # id(span) -> (task, thread id, Counter of stacks)
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def begin(self, span):
+        try:
+            task = asyncio.current_task()
+        except RuntimeError:
+            task = None
+        if task is None:
+            return False
+        with self._lock:
+            self._spans[id(span)] = (task, threading.get_ident(), Counter())
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="trace-profiler", daemon=True)
+                self._thread.start()
+        return True
+
+    def end(self, span):
+        with self._lock:
+            return self._spans.pop(id(span))[2]
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._spans:
+                    self._thread = None
+                    return
+                targets = list(self._spans.values())
+            thread_frames = sys._current_frames()
+            for task, thread_id, stacks in targets:
+                stack = _task_stack(task, thread_frames.get(thread_id))
+                if stack:
+                    stacks[stack] += 1
+            time.sleep(self.interval)
+
+
+def _frame_name(frame):
+    return f"{frame.f_code.co_name} ({os.path.basename(frame.f_code.co_filename)}:{frame.f_lineno})"
+
+
+def _task_stack(task, thread_frame):
+    names = []
+    innermost = None
+    running = False
+    coro = task.get_coro()
+    while coro is not None:
+        frame = getattr(coro, "cr_frame", None) or getattr(coro, "gi_frame", None)
+        if frame is None:
+            break
+        innermost = frame
+        names.append(_frame_name(frame))
+        running = running or getattr(coro, "cr_running", False)
+        coro = getattr(coro, "cr_await", None) or getattr(coro, "gi_yieldfrom", None)
+    if running and thread_frame is not None:
+        deeper = []
+        frame = thread_frame
+        while frame is not None and frame is not innermost:
+            deeper.append(_frame_name(frame))
+            frame = frame.f_back
+        if frame is innermost:
+            names.extend(reversed(deeper))
+    return ";".join(names)
@@ -0,0 +1,112 @@
+# upload_soak.py
+# Soak test for streamed uploads: python upload_soak.py [upload_count] [file_size_mb] [concurrency]
+import asyncio
+import os
+import socket
+import sys
+import tempfile
+import time
+from aiohttp import web
+
+import doc_server
+from uploads import UPLOAD_CHUNK_SIZE
+
+UPLOAD_COUNT = 10_000
+FILE_SIZE_MB = 16 # Large statements run to tens of MB
+CONCURRENCY = 4
+SOAK_FD_SLACK = 4 # descriptors the run may end with above the warmed-up baseline
+SOAK_RSS_SLACK_MB = 64 # resident memory growth allowed over the baseline
+
+
+def _open_fds():
+    return len(os.listdir("/proc/self/fd")) if os.path.isdir("/proc/self/fd") else None
+
+
+def _rss_mb():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024 # Peak, in KB on Linux
+
+
+async def soak(upload_count, file_size_mb, concurrency):
+    """
+    Uploads upload_count PDF files of file_size_mb through doc_server's
+    _upload_bank_statement against an in-process stub of the backend, and
+    checks that open descriptors stay flat and resident memory stays bounded,
+    i.e. that uploads are streamed and every handle and connection is released.
+    """
+
+    async def verify_bank_statement(request):
+        reader = await request.multipart()
+        part = await reader.next()
+        received = 0
+        while chunk := await part.read_chunk(UPLOAD_CHUNK_SIZE):
+            received += len(chunk)
+        return web.json_response({"firstName": "John", "lastName": "Doe", "address": f"{received} bytes"})
+
+    app = web.Application(client_max_size=2**40)
+    app.router.add_post("/verify/bank-statement", verify_bank_statement)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    await web.SockSite(runner, sock).start()
+    port = sock.getsockname()[1]
+    doc_server.backend.base_url = f"http://127.0.0.1:{port}"
+    await doc_server.backend.start()
+
+    directory = tempfile.mkdtemp(prefix="upload-soak-")
+    paths = []
+    block = os.urandom(1024 * 1024)
+    for i in range(min(upload_count, concurrency * 2)):
+        path = os.path.join(directory, f"statement-{i}.pdf")
+        with open(path, "wb") as f:
+            f.write(b"%PDF-1.4\n")
+            for _ in range(file_size_mb):
+                f.write(block)
+        paths.append(path)
+
+    async def upload_round(offset):
+        results = await asyncio.gather(*(doc_server._upload_bank_statement(paths[(offset + i) % len(paths)])
+                                         for i in range(concurrency)))
+        errors = [result["error"] for result in results if "error" in result]
+        assert not errors, f"Uploads failed: {errors[:3]}"
+
+    try:
+        await upload_round(0) # Warm up the connection pool and worker threads
+        fds_before, rss_before = _open_fds(), _rss_mb()
+        peak_fds, peak_rss = fds_before, rss_before
+        started = time.perf_counter()
+        for offset in range(0, upload_count, concurrency):
+            await upload_round(offset)
+            if fds_before is not None:
+                peak_fds = max(peak_fds, _open_fds())
+            peak_rss = max(peak_rss, _rss_mb())
+            if (offset // concurrency + 1) % max(1, 1000 // concurrency) == 0:
+                print(f"  {offset + concurrency} uploads, fds peak {peak_fds}, rss peak {peak_rss:.0f} MB")
+        seconds = time.perf_counter() - started
+        fds_after, rss_after = _open_fds(), _rss_mb()
+    finally:
+        await doc_server.backend.close()
+        await runner.cleanup()
+        for path in paths:
+            os.remove(path)
+        os.rmdir(directory)
+
+    uploaded_mb = -(-upload_count // concurrency) * concurrency * file_size_mb
+    print(f"{uploaded_mb} MB uploaded in {seconds:.1f}s ({uploaded_mb / seconds:.0f} MB/s), "
+          f"{file_size_mb} MB files, {concurrency} at a time")
+    print(f"  open fds : {fds_before} before, peak {peak_fds}, {fds_after} after")
+    print(f"  rss      : {rss_before:.0f} MB before, peak {peak_rss:.0f} MB, {rss_after:.0f} MB after")
+    if fds_before is not None:
+        assert fds_after <= fds_before + SOAK_FD_SLACK, f"File descriptors leaked: {fds_before} -> {fds_after}"
+    assert peak_rss <= rss_before + SOAK_RSS_SLACK_MB, f"Resident memory grew: {rss_before:.0f} -> {peak_rss:.0f} MB"
+    print("  OK: descriptors flat, memory bounded")
+
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:4]]
+    asyncio.run(soak(*args, *(UPLOAD_COUNT, FILE_SIZE_MB, CONCURRENCY)[len(args):]))
@@ -11,7 +11,13 @@ import re
 class BankStatementMCPServer(MCPServer):
     """MCP Server for bank statement processing."""
     
+    FIELD_SPECS = [
+        FieldSpec("name", "Name", validate=NAME_PATTERN),
+        FieldSpec("address", "Address", multiline=True, stop_at=("Account",), validate=ADDRESS_PATTERN),
+    ]
+    
     def __init__(self, data_hub: DataHub):
+        self.extractor = register_extractor(DocumentType.BANK_STATEMENT, self.FIELD_SPECS)
         super().__init__("BankStatementMCPServer", data_hub)
     
     def _register_tools(self):
@@ -26,16 +32,17 @@ class BankStatementMCPServer(MCPServer):
         # Simulate processing time
         await asyncio.sleep(1)
         
-        # Extract name and address
-        name = self._extract_name(document_content)
-        address = self._extract_address(document_content)
+        # Extract every field in one pass
+        fields = await self.run_cpu(self.extractor.extract, document_content)
+        name = fields["name"].value
+        address = fields["address"].value
         
         customer_info = CustomerInfo(
             name=name,
             address=address,
             document_type=DocumentType.BANK_STATEMENT,
             extracted_at=datetime.now().isoformat(),
-            confidence_score=0.95,
+            confidence_score=document_confidence(fields),
             metadata={"source": "bank_statement_parser", "mcp_server": self.name}
         )
         
@@ -43,7 +50,9 @@ class BankStatementMCPServer(MCPServer):
         await self.data_hub.store_customer_info(request_id, customer_info)
         self.log(f"Extracted and stored bank statement data for {name}")
         
-        return customer_info.to_dict()
+        result = customer_info.to_dict()
+        result["field_confidence"] = {field_name: field.confidence for field_name, field in fields.items()}
+        return result
     
     async def validate_document(self, document_content: str) -> Dict[str, Any]:
         """Validate bank statement format and content."""
@@ -57,10 +66,8 @@ class BankStatementMCPServer(MCPServer):
     
     def _extract_name(self, content: str) -> str:
         """Extract customer name from document content."""
-        match = re.search(r"Name:\s*(.+?)(?:\n|$)", content)
-        return match.group(1).strip() if match else "Unknown"
+        return self.extractor.extract(content)["name"].value
     
     def _extract_address(self, content: str) -> str:
         """Extract customer address from document content."""
-        match = re.search(r"Address:\s*(.+?)(?:\n\n|Account)", content, re.DOTALL)
-        return match.group(1).strip().replace("\n", ", ") if match else "Unknown"
+        return self.extractor.extract(content)["address"].value
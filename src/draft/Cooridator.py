@@ -11,6 +11,13 @@ import re
 class CoordinatorMCPServer(MCPServer):
     """MCP Server for coordinating verification process."""
     
+    NAME_EXACT_THRESHOLD = 0.95
+    NAME_PARTIAL_THRESHOLD = 0.75
+    ADDRESS_EXACT_THRESHOLD = 0.90
+    ADDRESS_PARTIAL_THRESHOLD = 0.70
+    # Seconds to wait for every required document before giving up on a request
+    COMPLETION_TIMEOUT = 300.0
+    
     def __init__(self, data_hub: DataHub):
         super().__init__("CoordinatorMCPServer", data_hub)
     
@@ -19,14 +26,16 @@ class CoordinatorMCPServer(MCPServer):
         self.register_tool("verify_documents", self.verify_documents)
         self.register_tool("compare_fields", self.compare_fields)
         self.register_tool("calculate_similarity", self.calculate_similarity)
+        self.register_tool("get_normalization_stats", self.get_normalization_stats)
+        self.register_tool("get_data_hub_stats", self.get_data_hub_stats)
     
     async def verify_documents(self, request_id: str) -> Dict[str, Any]:
         """Compare customer information from both documents."""
         self.log(f"Verifying data for request {request_id}")
         
         # Wait for data to be complete
-        while not await self.data_hub.is_data_complete(request_id):
-            await asyncio.sleep(0.5)
+        if not await self.data_hub.wait_until_complete(request_id, self.COMPLETION_TIMEOUT):
+            raise TimeoutError(f"Timed out waiting for documents for request {request_id}")
         
         # Retrieve data from Data Hub
         customer_data = await self.data_hub.get_customer_info(request_id)
@@ -34,13 +43,11 @@ class CoordinatorMCPServer(MCPServer):
         bank_info = customer_data[DocumentType.BANK_STATEMENT]
         credit_info = customer_data[DocumentType.CREDIT_REPORT]
         
-        # Compare names
-        name_match = self._compare_names(bank_info.name, credit_info.name)
-        name_similarity = self._calculate_similarity(bank_info.name, credit_info.name)
-        
-        # Compare addresses
-        address_match = self._compare_addresses(bank_info.address, credit_info.address)
-        address_similarity = self._calculate_similarity(bank_info.address, credit_info.address)
+        # Compare names and addresses; exact scores, since they feed the confidence score
+        name_similarity, address_similarity = await self.run_cpu(
+            score_customer_pair, bank_info.name, credit_info.name, bank_info.address, credit_info.address)
+        name_match = self._classify_name(name_similarity)
+        address_match = self._classify_address(address_similarity)
         
         # Calculate overall confidence
         confidence_score = (name_similarity + address_similarity) / 2
@@ -69,12 +76,12 @@ class CoordinatorMCPServer(MCPServer):
     
     async def compare_fields(self, field1: str, field2: str, field_type: str) -> Dict[str, Any]:
         """Compare two fields and return similarity metrics."""
-        similarity = self._calculate_similarity(field1, field2)
-        
         if field_type == "name":
-            match = self._compare_names(field1, field2)
+            similarity = self._name_similarity(field1, field2)
+            match = self._classify_name(similarity)
         else:
-            match = self._compare_addresses(field1, field2)
+            similarity = self._address_similarity(field1, field2)
+            match = self._classify_address(similarity)
         
         return {
             "similarity": similarity,
@@ -86,28 +93,37 @@ class CoordinatorMCPServer(MCPServer):
         """Calculate similarity ratio between two strings."""
         return self._calculate_similarity(str1, str2)
     
+    async def get_normalization_stats(self) -> Dict[str, Any]:
+        """Hit rate of the canonical name/address cache shared by every comparison."""
+        return canonical_cache_stats()
+    
+    async def get_data_hub_stats(self) -> Dict[str, Any]:
+        """Memory gauges and eviction counters of the shared Data Hub."""
+        return self.data_hub.memory_stats()
+    
     def _compare_names(self, name1: str, name2: str) -> MatchResult:
         """Compare two names and return match result."""
-        similarity = self._calculate_similarity(name1, name2)
-        
-        if similarity >= 0.95:
-            return MatchResult.EXACT_MATCH
-        elif similarity >= 0.75:
-            return MatchResult.PARTIAL_MATCH
-        else:
-            return MatchResult.MISMATCH
+        # Only the class is needed, so scoring may stop early below the partial threshold
+        return self._classify_name(self._name_similarity(name1, name2, self.NAME_PARTIAL_THRESHOLD))
     
     def _compare_addresses(self, addr1: str, addr2: str) -> MatchResult:
         """Compare two addresses and return match result."""
-        similarity = self._calculate_similarity(addr1, addr2)
-        
-        if similarity >= 0.90:
-            return MatchResult.EXACT_MATCH
-        elif similarity >= 0.70:
-            return MatchResult.PARTIAL_MATCH
-        else:
-            return MatchResult.MISMATCH
+        return self._classify_address(self._address_similarity(addr1, addr2, self.ADDRESS_PARTIAL_THRESHOLD))
+    
+    def _classify_name(self, similarity: float) -> MatchResult:
+        return classify_similarity(similarity, self.NAME_EXACT_THRESHOLD, self.NAME_PARTIAL_THRESHOLD)
+    
+    def _classify_address(self, similarity: float) -> MatchResult:
+        return classify_similarity(similarity, self.ADDRESS_EXACT_THRESHOLD, self.ADDRESS_PARTIAL_THRESHOLD)
+    
+    def _name_similarity(self, name1: str, name2: str, min_score: float = 0.0) -> float:
+        """Name similarity; scores below min_score come back as 0.0."""
+        return name_similarity(name1, name2, min_score)
+    
+    def _address_similarity(self, addr1: str, addr2: str, min_score: float = 0.0) -> float:
+        """Address similarity; scores below min_score come back as 0.0."""
+        return address_similarity(addr1, addr2, min_score)
     
     def _calculate_similarity(self, str1: str, str2: str) -> float:
         """Calculate similarity ratio between two strings."""
-        return SequenceMatcher(None, str1.lower(), str2.lower()).ratio()
+        return text_similarity(str1, str2)
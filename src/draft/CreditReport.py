@@ -11,7 +11,13 @@ import re
 class CreditReportMCPServer(MCPServer):
     """MCP Server for credit report processing."""
     
+    FIELD_SPECS = [
+        FieldSpec("name", "Consumer Name", validate=NAME_PATTERN),
+        FieldSpec("address", "Current Address", multiline=True, stop_at=("SSN",), validate=ADDRESS_PATTERN),
+    ]
+    
     def __init__(self, data_hub: DataHub):
+        self.extractor = register_extractor(DocumentType.CREDIT_REPORT, self.FIELD_SPECS)
         super().__init__("CreditReportMCPServer", data_hub)
     
     def _register_tools(self):
@@ -26,16 +32,17 @@ class CreditReportMCPServer(MCPServer):
         # Simulate processing time
         await asyncio.sleep(1.2)
         
-        # Extract name and address
-        name = self._extract_name(document_content)
-        address = self._extract_address(document_content)
+        # Extract every field in one pass
+        fields = await self.run_cpu(self.extractor.extract, document_content)
+        name = fields["name"].value
+        address = fields["address"].value
         
         customer_info = CustomerInfo(
             name=name,
             address=address,
             document_type=DocumentType.CREDIT_REPORT,
             extracted_at=datetime.now().isoformat(),
-            confidence_score=0.92,
+            confidence_score=document_confidence(fields),
             metadata={"source": "credit_report_parser", "mcp_server": self.name}
         )
         
@@ -43,7 +50,9 @@ class CreditReportMCPServer(MCPServer):
         await self.data_hub.store_customer_info(request_id, customer_info)
         self.log(f"Extracted and stored credit report data for {name}")
         
-        return customer_info.to_dict()
+        result = customer_info.to_dict()
+        result["field_confidence"] = {field_name: field.confidence for field_name, field in fields.items()}
+        return result
     
     async def calculate_credit_score(self, document_content: str) -> Dict[str, Any]:
         """Extract and analyze credit score."""
@@ -56,12 +65,8 @@ class CreditReportMCPServer(MCPServer):
     
     def _extract_name(self, content: str) -> str:
         """Extract customer name from document content."""
-        match = re.search(r"Consumer Name:\s*(.+?)(?:\n|$)", content)
-        return match.group(1).strip() if match else "Unknown"
+        return self.extractor.extract(content)["name"].value
     
     def _extract_address(self, content: str) -> str:
         """Extract customer address from document content."""
-        match = re.search(r"Current Address:\s*(.+?)(?:\n\n|SSN)", content, re.DOTALL)
-        return match.group(1).strip().replace("\n", ", ") if match else "Unknown"
-
- 
\ No newline at end of file
+        return self.extractor.extract(content)["address"].value
@@ -6,74 +6,546 @@ from datetime import datetime
 from enum import Enum
 from typing import Dict, List, Optional, Any, Callable
 from difflib import SequenceMatcher
+from collections import OrderedDict, deque
+import fnmatch
 import re
+import time
+
+if __name__ == "__main__":
+    # Standalone benchmarks (see the bottom of this file)
+    from DataModel import DocumentType, CustomerInfo, VerificationResult, SupervisorDecision, MatchResult
+    from DataHubStorage import DataHubStorage, InMemoryStorage, SqliteStorage
+
+class Subscription:
+    """
+    One subscriber to Data Hub events matching a topic pattern ("data_stored.*",
+    "verification_complete.REQ-1"). Events are queued to a bounded per-subscriber
+    queue and delivered by the subscriber's own task, so a slow callback only
+    ever delays itself. When the queue is full the overflow policy drops either
+    the oldest queued event or the new one.
+    """
+    
+    DROP_OLDEST = "drop_oldest"
+    DROP_NEWEST = "drop_newest"
+    
+    def __init__(self, pattern: str, callback: Callable, max_queue: int = 1000, overflow: str = DROP_OLDEST):
+        if overflow not in (self.DROP_OLDEST, self.DROP_NEWEST):
+            raise ValueError(f"Unknown overflow policy: {overflow}")
+        self.pattern = pattern
+        self.callback = callback
+        self.max_queue = max_queue
+        self.overflow = overflow
+        self.is_wildcard = any(c in pattern for c in "*?[")
+        self._match = re.compile(fnmatch.translate(pattern)).match if self.is_wildcard else None
+        self._queue: deque = deque()
+        self._ready: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        # Metrics
+        self.delivered = 0
+        self.dropped = 0
+        self.errors = 0
+        self.max_lag = 0.0
+    
+    def matches(self, topic: str) -> bool:
+        return self._match(topic) is not None if self.is_wildcard else topic == self.pattern
+    
+    def offer(self, topic: str, data: Any):
+        """Queue an event without ever waiting on the subscriber."""
+        if len(self._queue) >= self.max_queue:
+            self.dropped += 1
+            if self.overflow == self.DROP_NEWEST:
+                return
+            self._queue.popleft()
+        self._queue.append((time.monotonic(), topic, data))
+        if self._task is None:
+            self._ready = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._deliver())
+        self._ready.set()
+    
+    async def _deliver(self):
+        while True:
+            await self._ready.wait()
+            self._ready.clear()
+            while self._queue:
+                published_at, topic, data = self._queue.popleft()
+                self.max_lag = max(self.max_lag, time.monotonic() - published_at)
+                try:
+                    await self.callback(data)
+                    self.delivered += 1
+                except Exception as e:
+                    self.errors += 1
+                    print(f"[DataHub] Error notifying subscriber {self.pattern} of {topic}: {e}")
+    
+    def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        self._queue.clear()
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pattern": self.pattern,
+            "queued": len(self._queue),
+            "max_queue": self.max_queue,
+            "overflow": self.overflow,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+            "errors": self.errors,
+            # Age of the oldest undelivered event
+            "lag_seconds": time.monotonic() - self._queue[0][0] if self._queue else 0.0,
+            "max_lag_seconds": self.max_lag,
+        }
+
+
 class DataHub:
-    """Centralized repository for storing and retrieving extracted document data."""
+    """
+    Centralized repository for storing and retrieving extracted document data.
+    The in-memory maps are a bounded hot cache; with a persistent storage
+    backend every record is also written behind to it, and requests that
+    have been evicted are reloaded from it on demand.
+    """
     
-    def __init__(self):
+    LOCK_SHARDS = 64
+    # Requests are forgotten RETENTION_SECONDS after they were first seen, and
+    # beyond MAX_REQUESTS the oldest completed ones are evicted. In-flight
+    # requests are never evicted for room; new ones are refused instead.
+    RETENTION_SECONDS = 3600.0
+    MAX_REQUESTS = 10000
+    MAX_SHARED_METADATA = 1024
+    
+    def __init__(self, lock_shards: int = LOCK_SHARDS, required_documents: Optional[List[DocumentType]] = None,
+                 retention_seconds: float = RETENTION_SECONDS, max_requests: int = MAX_REQUESTS,
+                 storage: Optional[DataHubStorage] = None):
         self._data: Dict[str, Dict[DocumentType, CustomerInfo]] = {}
         self._verification_results: Dict[str, VerificationResult] = {}
         self._supervisor_decisions: Dict[str, SupervisorDecision] = {}
-        self._lock = asyncio.Lock()
-        self._event_subscribers: Dict[str, List[Callable]] = {}
+        # Writers for the same request_id share a lock; unrelated requests rarely do.
+        # Getters take no lock: every update is a single dict assignment.
+        self._locks = [asyncio.Lock() for _ in range(lock_shards)]
+        # Exact-topic subscriptions are looked up directly; wildcard ones are matched per event
+        self._topic_subscriptions: Dict[str, List[Subscription]] = {}
+        self._wildcard_subscriptions: List[Subscription] = []
+        # Document types a request needs before it can be verified
+        self.required_documents = frozenset(required_documents or
+                                            (DocumentType.BANK_STATEMENT, DocumentType.CREDIT_REPORT))
+        self._completion_waiters: Dict[str, List[asyncio.Future]] = {}
+        # Retention bookkeeping
+        self.retention_seconds = retention_seconds
+        self.max_requests = max_requests
+        self._request_times: OrderedDict = OrderedDict() # request_id -> first seen, oldest first
+        self._completed: OrderedDict = OrderedDict() # request_ids with a supervisor decision, oldest first
+        self._shared_metadata: Dict[tuple, Dict[str, Any]] = {}
+        self.expired_requests = 0
+        self.evicted_completed = 0
+        self.rejected_requests = 0
+        self.storage = storage or InMemoryStorage()
+        self._persistent = not isinstance(self.storage, InMemoryStorage)
+        self.storage_reloads = 0
+    
+    def _track(self, request_id: str):
+        """Start the retention clock for a request and evict whatever it pushes out."""
+        if request_id in self._request_times:
+            return
+        now = time.monotonic()
+        while self._request_times:
+            oldest, first_seen = next(iter(self._request_times.items()))
+            if now - first_seen < self.retention_seconds:
+                break
+            self._forget(oldest)
+            self.expired_requests += 1
+        while len(self._request_times) >= self.max_requests and self._completed:
+            self._forget(next(iter(self._completed)))
+            self.evicted_completed += 1
+        if len(self._request_times) >= self.max_requests:
+            # Every slot is held by an in-flight request; dropping one would
+            # strand its waiters, so refuse the new request instead.
+            self.rejected_requests += 1
+            raise RuntimeError(f"DataHub is full: {len(self._request_times)} requests in flight "
+                               f"(max_requests={self.max_requests}), rejecting request {request_id}")
+        self._request_times[request_id] = now
+    
+    def _forget(self, request_id: str):
+        # Don't leave anyone waiting on a request that is gone
+        for waiter in self._completion_waiters.pop(request_id, []):
+            if not waiter.done():
+                waiter.set_exception(RuntimeError(f"Request {request_id} was evicted before its documents arrived"))
+        self._request_times.pop(request_id, None)
+        self._completed.pop(request_id, None)
+        self._data.pop(request_id, None)
+        self._verification_results.pop(request_id, None)
+        self._supervisor_decisions.pop(request_id, None)
+        for topic in (f"data_stored.{request_id}", f"verification_complete.{request_id}"):
+            for subscription in self._topic_subscriptions.pop(topic, []):
+                subscription.close()
+    
+    def _share_metadata(self, metadata: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """Every record from the same extractor carries the same metadata; keep one copy (treat as read-only)."""
+        if not metadata:
+            return metadata
+        try:
+            key = tuple(sorted(metadata.items()))
+        except TypeError: # unhashable values
+            return metadata
+        shared = self._shared_metadata.get(key)
+        if shared is None:
+            if len(self._shared_metadata) >= self.MAX_SHARED_METADATA:
+                return metadata
+            shared = self._shared_metadata[key] = metadata
+        return shared
+    
+    def _lock_for(self, request_id: str) -> asyncio.Lock:
+        return self._locks[hash(request_id) % len(self._locks)]
     
     async def store_customer_info(self, request_id: str, info: CustomerInfo):
         """Store extracted customer information."""
-        async with self._lock:
-            if request_id not in self._data:
-                self._data[request_id] = {}
-            self._data[request_id][info.document_type] = info
+        info.metadata = self._share_metadata(info.metadata)
+        # Wait for the storage backend before touching state, so save() below always fits
+        await self.storage.wait_for_capacity()
+        async with self._lock_for(request_id):
+            self._track(request_id)
+            documents = dict(self._data.get(request_id, {}))
+            documents[info.document_type] = info
+            self._data[request_id] = documents
             print(f"[DataHub] Stored {info.document_type.value} data for request {request_id}")
-            
-            # Notify subscribers
-            await self._notify_subscribers(f"data_stored_{request_id}", info)
+        
+        if self.required_documents.issubset(documents):
+            for waiter in self._completion_waiters.pop(request_id, []):
+                if not waiter.done():
+                    waiter.set_result(True)
+        
+        # Subscribers are notified outside the lock and never awaited
+        self._publish(f"data_stored.{request_id}", info)
+        self.storage.save("customer_info", request_id, info.to_dict())
     
     async def get_customer_info(self, request_id: str) -> Dict[DocumentType, CustomerInfo]:
         """Retrieve all customer information for a request."""
-        async with self._lock:
-            return self._data.get(request_id, {})
+        if self._persistent and request_id not in self._request_times:
+            return (await self._reload(request_id))[0]
+        return self._data.get(request_id, {})
     
     async def is_data_complete(self, request_id: str) -> bool:
-        """Check if data from both documents is available."""
-        async with self._lock:
-            data = self._data.get(request_id, {})
-            return (DocumentType.BANK_STATEMENT in data and 
-                    DocumentType.CREDIT_REPORT in data)
+        """Check if data from every required document is available."""
+        return self.required_documents.issubset(self._data.get(request_id, {}))
+    
+    async def wait_until_complete(self, request_id: str, timeout: Optional[float] = None) -> bool:
+        """
+        Wait until every required document for a request has been stored.
+        Returns False if the timeout expires first, and raises RuntimeError if
+        the request is evicted from the hub first.
+        """
+        if self.required_documents.issubset(self._data.get(request_id, {})):
+            return True
+        waiter = asyncio.get_running_loop().create_future()
+        self._completion_waiters.setdefault(request_id, []).append(waiter)
+        try:
+            return await asyncio.wait_for(waiter, timeout)
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            # Drop the waiter if it timed out or was cancelled before completion
+            waiters = self._completion_waiters.get(request_id)
+            if waiters is not None and waiter in waiters:
+                waiters.remove(waiter)
+                if not waiters:
+                    del self._completion_waiters[request_id]
     
     async def store_verification_result(self, result: VerificationResult):
         """Store verification result."""
-        async with self._lock:
+        await self.storage.wait_for_capacity()
+        async with self._lock_for(result.request_id):
+            self._track(result.request_id)
             self._verification_results[result.request_id] = result
             print(f"[DataHub] Stored verification result for request {result.request_id}")
-            await self._notify_subscribers(f"verification_complete_{result.request_id}", result)
+        self._publish(f"verification_complete.{result.request_id}", result)
+        self.storage.save("verification_result", result.request_id, self._verification_record(result))
     
     async def get_verification_result(self, request_id: str) -> Optional[VerificationResult]:
         """Retrieve verification result."""
-        async with self._lock:
-            return self._verification_results.get(request_id)
+        if self._persistent and request_id not in self._request_times:
+            return (await self._reload(request_id))[1]
+        return self._verification_results.get(request_id)
     
     async def store_supervisor_decision(self, decision: SupervisorDecision):
         """Store supervisor decision."""
-        async with self._lock:
+        await self.storage.wait_for_capacity()
+        async with self._lock_for(decision.request_id):
+            self._track(decision.request_id)
             self._supervisor_decisions[decision.request_id] = decision
+            self._completed[decision.request_id] = None
             print(f"[DataHub] Stored supervisor decision for request {decision.request_id}")
+        self.storage.save("supervisor_decision", decision.request_id, asdict(decision))
     
     async def get_supervisor_decision(self, request_id: str) -> Optional[SupervisorDecision]:
         """Retrieve supervisor decision."""
-        async with self._lock:
-            return self._supervisor_decisions.get(request_id)
-    
-    def subscribe(self, event: str, callback: Callable):
-        """Subscribe to data hub events."""
-        if event not in self._event_subscribers:
-            self._event_subscribers[event] = []
-        self._event_subscribers[event].append(callback)
-    
-    async def _notify_subscribers(self, event: str, data: Any):
-        """Notify subscribers of an event."""
-        if event in self._event_subscribers:
-            for callback in self._event_subscribers[event]:
-                try:
-                    await callback(data)
-                except Exception as e:
-                    print(f"[DataHub] Error notifying subscriber: {e}")
+        if self._persistent and request_id not in self._request_times:
+            return (await self._reload(request_id))[2]
+        return self._supervisor_decisions.get(request_id)
+    
+    async def get_records_between(self, start: datetime, end: datetime,
+                                  kind: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Audit query: every stored record in [start, end), optionally of a single kind."""
+        return await self.storage.query_time_range(start.timestamp(), end.timestamp(), kind)
+    
+    async def close(self):
+        """Stop event delivery, flush pending writes and release the storage backend."""
+        for subscription in self._all_subscriptions():
+            subscription.close()
+        await self.storage.close()
+    
+    @staticmethod
+    def _verification_record(result: VerificationResult) -> Dict[str, Any]:
+        record = asdict(result)
+        record["name_match"] = result.name_match.value
+        record["address_match"] = result.address_match.value
+        return record
+    
+    async def _reload(self, request_id: str) -> tuple:
+        """
+        Bring an evicted (or pre-restart) request back into the hot cache from
+        storage. Returns its (documents, verification result, supervisor
+        decision); when the cache is full of in-flight requests they are
+        returned without being cached.
+        """
+        records = await self.storage.load(request_id)
+        documents, result, decision = {}, None, None
+        for row in records:
+            record = row["record"]
+            if row["kind"] == "customer_info":
+                info = CustomerInfo(**{**record, "document_type": DocumentType(record["document_type"])})
+                info.metadata = self._share_metadata(info.metadata)
+                documents[info.document_type] = info
+            elif row["kind"] == "verification_result":
+                result = VerificationResult(**{
+                    **record,
+                    "name_match": MatchResult(record["name_match"]),
+                    "address_match": MatchResult(record["address_match"])})
+            elif row["kind"] == "supervisor_decision":
+                decision = SupervisorDecision(**record)
+        if records and request_id not in self._request_times:
+            try:
+                self._track(request_id)
+            except RuntimeError:
+                return documents, result, decision
+            if documents:
+                self._data[request_id] = documents
+            if result is not None:
+                self._verification_results[request_id] = result
+            if decision is not None:
+                self._supervisor_decisions[request_id] = decision
+                self._completed[request_id] = None
+            self.storage_reloads += 1
+        # Stored while we were loading: the cache is newer
+        return (self._data.get(request_id, documents), self._verification_results.get(request_id, result),
+                self._supervisor_decisions.get(request_id, decision))
+    
+    def memory_stats(self) -> Dict[str, Any]:
+        """Gauges for everything the hub holds on to."""
+        return {
+            "tracked_requests": len(self._request_times),
+            "completed_requests": len(self._completed),
+            "customer_records": sum(len(documents) for documents in self._data.values()),
+            "verification_results": len(self._verification_results),
+            "supervisor_decisions": len(self._supervisor_decisions),
+            "subscribed_topics": len(self._topic_subscriptions),
+            "subscribers": sum(1 for _ in self._all_subscriptions()),
+            "completion_waiters": sum(len(waiters) for waiters in self._completion_waiters.values()),
+            "shared_metadata": len(self._shared_metadata),
+            "max_requests": self.max_requests,
+            "retention_seconds": self.retention_seconds,
+            "expired_requests": self.expired_requests,
+            "evicted_completed": self.evicted_completed,
+            "rejected_requests": self.rejected_requests,
+            "storage_reloads": self.storage_reloads,
+            "storage": self.storage.stats(),
+        }
+    
+    def subscribe(self, pattern: str, callback: Callable, max_queue: int = 1000,
+                  overflow: str = Subscription.DROP_OLDEST) -> Subscription:
+        """
+        Subscribe to data hub events. Topics are "data_stored.<request_id>" and
+        "verification_complete.<request_id>"; patterns may use wildcards
+        ("data_stored.*", "*").
+        """
+        subscription = Subscription(pattern, callback, max_queue, overflow)
+        if subscription.is_wildcard:
+            self._wildcard_subscriptions.append(subscription)
+        else:
+            self._topic_subscriptions.setdefault(pattern, []).append(subscription)
+        return subscription
+    
+    def unsubscribe(self, subscription: Subscription):
+        subscription.close()
+        if subscription in self._wildcard_subscriptions:
+            self._wildcard_subscriptions.remove(subscription)
+        subscriptions = self._topic_subscriptions.get(subscription.pattern, [])
+        if subscription in subscriptions:
+            subscriptions.remove(subscription)
+            if not subscriptions:
+                del self._topic_subscriptions[subscription.pattern]
+    
+    def subscriber_stats(self) -> List[Dict[str, Any]]:
+        """Queue depth, drops and delivery lag of every subscriber."""
+        return [subscription.stats() for subscription in self._all_subscriptions()]
+    
+    def _all_subscriptions(self):
+        yield from self._wildcard_subscriptions
+        for subscriptions in self._topic_subscriptions.values():
+            yield from subscriptions
+    
+    def _publish(self, topic: str, data: Any):
+        """Queue an event for every matching subscriber."""
+        for subscription in self._topic_subscriptions.get(topic, ()):
+            subscription.offer(topic, data)
+        for subscription in self._wildcard_subscriptions:
+            if subscription.matches(topic):
+                subscription.offer(topic, data)
+
+
+# ============================================================================
+# BENCHMARKS: python DataHub.py [request_count]
+# ============================================================================
+
+def _benchmark(request_count: int = 2000, readers_per_request: int = 20, callback_seconds: float = 0.001):
+    """
+    Every request stores both documents while readers poll it, and a per-request
+    subscriber does a little I/O per store. Compares one global lock held
+    across awaited notification (as before) with the sharded hub and its
+    queued dispatch. A slow "data_stored.*" subscriber is attached to both.
+    """
+    import contextlib
+    import io
+    import time
+    
+    class GlobalLockDataHub(DataHub):
+        def __init__(self):
+            super().__init__(lock_shards=1)
+            self._callbacks = {}
+        
+        def subscribe(self, pattern, callback, **kwargs):
+            self._callbacks.setdefault(pattern, []).append(callback)
+        
+        async def store_customer_info(self, request_id, info):
+            async with self._locks[0]:
+                self._data.setdefault(request_id, {})[info.document_type] = info
+                for callback in self._callbacks.get(f"data_stored.{request_id}", []) + self._callbacks.get("data_stored.*", []):
+                    await callback(info)
+        
+        async def get_customer_info(self, request_id):
+            async with self._locks[0]:
+                return self._data.get(request_id, {})
+    
+    async def run(hub):
+        async def on_stored(info):
+            await asyncio.sleep(callback_seconds)
+        
+        # Sees every store, so it falls behind whenever stores arrive faster than 1/callback_seconds
+        hub.subscribe("data_stored.*", on_stored, max_queue=500)
+        
+        async def request(i):
+            request_id = f"req-{i}"
+            hub.subscribe(f"data_stored.{request_id}", on_stored)
+            now = datetime.now().isoformat()
+            writers = [hub.store_customer_info(request_id, CustomerInfo("John Smith", "1 Main St", doc_type, now))
+                       for doc_type in (DocumentType.BANK_STATEMENT, DocumentType.CREDIT_REPORT)]
+            readers = [hub.get_customer_info(request_id) for _ in range(readers_per_request)]
+            await asyncio.gather(*writers, *readers)
+        
+        started = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            await asyncio.gather(*(request(i) for i in range(request_count)))
+        seconds = time.perf_counter() - started
+        lagging = [stats for stats in hub.subscriber_stats() if stats["pattern"] == "data_stored.*"]
+        await hub.close()
+        return seconds, lagging
+    
+    operations = request_count * (2 + readers_per_request)
+    print(f"{request_count} requests, {operations} store/get calls, {callback_seconds * 1000:.0f}ms subscribers")
+    for label, hub in (("global lock", GlobalLockDataHub()), ("sharded", DataHub())):
+        seconds, lagging = asyncio.run(run(hub))
+        print(f"  {label:<12}: {seconds:.2f}s ({operations / seconds:,.0f} ops/s)")
+        for stats in lagging:
+            print(f"    {stats['pattern']} subscriber at ingestion end: {stats['queued']} queued, {stats['dropped']} dropped "
+                  f"({stats['overflow']}), lag {stats['lag_seconds'] * 1000:.0f}ms")
+
+
+async def _store_request(hub: DataHub, i: int):
+    """One fully processed request: two extractions, a verification and a decision."""
+    request_id = f"req-{i:08d}"
+    now = datetime.now().isoformat()
+    infos = []
+    for doc_type, source in ((DocumentType.BANK_STATEMENT, "bank_statement_parser"),
+                             (DocumentType.CREDIT_REPORT, "credit_report_parser")):
+        info = CustomerInfo(f"John Smith {i}", f"{i} Main Street, Springfield", doc_type, now, 0.95,
+                            {"source": source, "mcp_server": "ExtractorMCPServer"})
+        await hub.store_customer_info(request_id, info)
+        infos.append(info)
+    await hub.store_verification_result(VerificationResult(
+        request_id, MatchResult.EXACT_MATCH, MatchResult.EXACT_MATCH, True, 1.0,
+        {"bank_statement": infos[0].to_dict(), "credit_report": infos[1].to_dict(),
+         "name_similarity": 1.0, "address_similarity": 1.0}, now))
+    await hub.store_supervisor_decision(SupervisorDecision(
+        request_id, True, "AUTO_APPROVE", "All fields match exactly", now))
+
+
+def _memory_benchmark(request_count: int = 10000):
+    """Bytes retained per fully processed request."""
+    import contextlib
+    import io
+    import tracemalloc
+    
+    async def run(hub):
+        for i in range(request_count):
+            await _store_request(hub, i)
+    
+    hub = DataHub(max_requests=request_count)
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    with contextlib.redirect_stdout(io.StringIO()):
+        asyncio.run(run(hub))
+    retained = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    print(f"{request_count} requests retained: {retained / request_count:,.0f} bytes/request")
+    print(f"  {hub.memory_stats()}")
+
+
+def _storage_benchmark(request_count: int = 20000, concurrency: int = 200, hot_requests: int = 1000):
+    """Store throughput with and without the SQLite write-behind backend, plus cold reads."""
+    import contextlib
+    import io
+    import os
+    import tempfile
+    
+    async def run(hub):
+        started = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            for start in range(0, request_count, concurrency):
+                await asyncio.gather(*(_store_request(hub, i) for i in range(start, min(start + concurrency, request_count))))
+        stored = time.perf_counter() - started
+        await hub.storage.flush()
+        flushed = time.perf_counter() - started
+        
+        started = time.perf_counter()
+        cold = [await hub.get_verification_result(f"req-{i:08d}") for i in range(0, request_count, request_count // 100)]
+        cold_ms = (time.perf_counter() - started) * 1000 / len(cold)
+        audit = await hub.get_records_between(datetime.fromtimestamp(0), datetime.now(), "supervisor_decision")
+        stats = hub.memory_stats()
+        await hub.close()
+        return stored, flushed, sum(r is not None for r in cold), cold_ms, len(audit), stats
+    
+    print(f"{request_count} requests ({4 * request_count} records), {concurrency} concurrent, "
+          f"hot cache of {hot_requests} requests")
+    with tempfile.TemporaryDirectory() as directory:
+        for label, storage in (("in-memory", None), ("sqlite", SqliteStorage(os.path.join(directory, "hub.sqlite3")))):
+            stored, flushed, found, cold_ms, audited, stats = asyncio.run(
+                run(DataHub(max_requests=hot_requests, storage=storage)))
+            print(f"  {label:<10}: {stored:.2f}s ({4 * request_count / stored:,.0f} records/s), durable after {flushed:.2f}s; "
+                  f"{found}/100 evicted requests readable ({cold_ms:.2f}ms each); {audited} decisions in time-range query")
+            print(f"              {stats['storage']}")
+
+
+if __name__ == "__main__":
+    import sys
+    
+    _benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
+    _memory_benchmark()
+    _storage_benchmark()
@@ -0,0 +1,246 @@
+import asyncio
+import json
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, asdict
+from datetime import datetime
+from enum import Enum
+from typing import Dict, List, Optional, Any, Callable
+from difflib import SequenceMatcher
+import re
+import os
+import sqlite3
+import threading
+import time
+
+# ============================================================================
+# DATA HUB STORAGE BACKENDS
+# ============================================================================
+
+class DataHubStorage(ABC):
+    """
+    Persistent record of everything stored in the Data Hub (the audit source
+    of truth). The hub's in-memory maps stay the hot cache in front of it.
+    Records are plain JSON-able dicts tagged with a kind ("customer_info",
+    "verification_result", "supervisor_decision").
+    """
+
+    @abstractmethod
+    def save(self, kind: str, request_id: str, record: Dict[str, Any]):
+        """Queue a record for persistence. Must not block or raise."""
+        pass
+
+    async def wait_for_capacity(self):
+        """Backpressure: wait until save() can accept a record. Called before the hub mutates state."""
+        pass
+
+    @abstractmethod
+    async def load(self, request_id: str) -> List[Dict[str, Any]]:
+        """All records of a request, oldest first."""
+        pass
+
+    @abstractmethod
+    async def query_time_range(self, start: float, end: float, kind: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Records stored between two epoch timestamps, oldest first."""
+        pass
+
+    async def flush(self):
+        """Wait until every queued record is durable."""
+        pass
+
+    async def close(self):
+        pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {}
+
+
+class InMemoryStorage(DataHubStorage):
+    """No persistence; the Data Hub's in-memory maps are all there is."""
+
+    def save(self, kind: str, request_id: str, record: Dict[str, Any]):
+        pass
+
+    async def load(self, request_id: str) -> List[Dict[str, Any]]:
+        return []
+
+    async def query_time_range(self, start: float, end: float, kind: Optional[str] = None) -> List[Dict[str, Any]]:
+        return []
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": "memory"}
+
+
+class SqliteStorage(DataHubStorage):
+    """
+    SQLite (WAL) storage with write-behind: save() only appends to a pending
+    buffer, and a background task commits the buffer in batches of up to
+    BATCH_SIZE records per transaction, at least every FLUSH_INTERVAL seconds.
+    The caller never waits on a disk sync.
+
+    The buffer is bounded: wait_for_capacity() holds writers back while
+    MAX_PENDING records are waiting, and a save() that still finds the buffer
+    full drops the record and counts it in saves_rejected.
+    A failed batch is retried up to MAX_RETRIES times with backoff and then
+    dropped; the next flush(), load() or query_time_range() raises the error
+    until a later batch is written successfully.
+    """
+
+    BATCH_SIZE = 500
+    FLUSH_INTERVAL = 0.05
+    MAX_PENDING = 100_000
+    MAX_RETRIES = 5
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS records (
+        id          INTEGER PRIMARY KEY AUTOINCREMENT,
+        request_id  TEXT NOT NULL,
+        kind        TEXT NOT NULL,
+        stored_at   REAL NOT NULL,
+        payload     TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS records_request ON records (request_id, id);
+    CREATE INDEX IF NOT EXISTS records_time ON records (stored_at, kind);
+    """
+
+    def __init__(self, path: str, batch_size: int = BATCH_SIZE, flush_interval: float = FLUSH_INTERVAL,
+                 max_pending: int = MAX_PENDING, max_retries: int = MAX_RETRIES):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.max_retries = max_retries
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(self.SCHEMA)
+        self._conn_lock = threading.Lock()
+        self._pending: List[tuple] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._writer: Optional[asyncio.Task] = None
+        self._closed = False
+        self._write_error: Optional[Exception] = None
+        # Metrics
+        self.records_written = 0
+        self.batches_written = 0
+        self.peak_pending = 0
+        self.write_errors = 0
+        self.records_dropped = 0
+        self.saves_rejected = 0
+
+    def save(self, kind: str, request_id: str, record: Dict[str, Any]):
+        if self._closed or len(self._pending) >= self.max_pending:
+            # Writes are not keeping up (or failing); drop rather than grow without bound.
+            # The record is already in the hub's memory, so the caller must not see an error.
+            self.saves_rejected += 1
+            print(f"[DataHubStorage] {'Storage closed' if self._closed else 'Write buffer full'}, "
+                  f"dropping {kind} for {request_id}")
+            return
+        self._pending.append((request_id, kind, time.time(), json.dumps(record, default=str)))
+        self.peak_pending = max(self.peak_pending, len(self._pending))
+        if self._writer is None or self._writer.done():
+            self._wakeup = asyncio.Event()
+            self._writer = asyncio.get_running_loop().create_task(self._write_behind())
+        if len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+
+    async def wait_for_capacity(self):
+        while len(self._pending) >= self.max_pending and not self._closed:
+            self._wakeup.set()
+            await asyncio.sleep(self.flush_interval)
+
+    async def _write_behind(self):
+        while self._pending:
+            if len(self._pending) < self.batch_size:
+                try:
+                    # Let concurrent writers fill the batch
+                    await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+            self._wakeup.clear()
+            batch, self._pending = self._pending[:self.batch_size], self._pending[self.batch_size:]
+            for attempt in range(1, self.max_retries + 1):
+                try:
+                    await asyncio.to_thread(self._insert, batch)
+                    self._write_error = None
+                    break
+                except Exception as e:
+                    self.write_errors += 1
+                    if attempt == self.max_retries:
+                        self.records_dropped += len(batch)
+                        self._write_error = e
+                        print(f"[DataHubStorage] Dropping {len(batch)} records after {attempt} failed writes: {e}")
+                    else:
+                        print(f"[DataHubStorage] Error writing {len(batch)} records (attempt {attempt}): {e}")
+                        await asyncio.sleep(self.flush_interval * 2 ** (attempt - 1))
+
+    def _insert(self, batch: List[tuple]):
+        with self._conn_lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(
+                    "INSERT INTO records (request_id, kind, stored_at, payload) VALUES (?, ?, ?, ?)", batch)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        self.records_written += len(batch)
+        self.batches_written += 1
+
+    def _select(self, sql: str, params: tuple) -> List[Dict[str, Any]]:
+        with self._conn_lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [{"request_id": request_id, "kind": kind, "stored_at": stored_at, "record": json.loads(payload)}
+                for request_id, kind, stored_at, payload in rows]
+
+    async def flush(self):
+        while self._writer is not None and not self._writer.done():
+            self._wakeup.set()
+            await asyncio.shield(self._writer)
+        if self._write_error is not None:
+            raise RuntimeError(f"Records could not be written to {self.path}") from self._write_error
+
+    async def load(self, request_id: str) -> List[Dict[str, Any]]:
+        if self._pending:
+            await self.flush()
+        return await asyncio.to_thread(
+            self._select,
+            "SELECT request_id, kind, stored_at, payload FROM records WHERE request_id = ? ORDER BY id",
+            (request_id,))
+
+    async def query_time_range(self, start: float, end: float, kind: Optional[str] = None) -> List[Dict[str, Any]]:
+        if self._pending:
+            await self.flush()
+        if kind is None:
+            sql = ("SELECT request_id, kind, stored_at, payload FROM records "
+                   "WHERE stored_at >= ? AND stored_at < ? ORDER BY stored_at, id")
+            params = (start, end)
+        else:
+            sql = ("SELECT request_id, kind, stored_at, payload FROM records "
+                   "WHERE stored_at >= ? AND stored_at < ? AND kind = ? ORDER BY stored_at, id")
+            params = (start, end, kind)
+        return await asyncio.to_thread(self._select, sql, params)
+
+    async def close(self):
+        self._closed = True
+        try:
+            await self.flush()
+        finally:
+            with self._conn_lock:
+                self._conn.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": "sqlite",
+            "path": self.path,
+            "pending": len(self._pending),
+            "max_pending": self.max_pending,
+            "peak_pending": self.peak_pending,
+            "records_written": self.records_written,
+            "batches_written": self.batches_written,
+            "write_errors": self.write_errors,
+            "records_dropped": self.records_dropped,
+            "saves_rejected": self.saves_rejected,
+        }
@@ -26,7 +26,7 @@ class MatchResult(Enum):
     MISMATCH = "mismatch"
 
 
-@dataclass
+@dataclass(slots=True)
 class CustomerInfo:
     name: str
     address: str
@@ -41,7 +41,7 @@ class CustomerInfo:
         return result
 
 
-@dataclass
+@dataclass(slots=True)
 class VerificationResult:
     request_id: str
     name_match: MatchResult
@@ -52,7 +52,7 @@ class VerificationResult:
     timestamp: str
 
 
-@dataclass
+@dataclass(slots=True)
 class SupervisorDecision:
     request_id: str
     approved: bool
@@ -14,8 +14,12 @@ import re
 class DocumentVerificationSystem:
     """Main orchestration system using MCP servers."""
     
-    def __init__(self):
-        self.data_hub = DataHub()
+    def __init__(self, storage: Optional[DataHubStorage] = None, offload: Optional[CPUOffload] = None):
+        # Pass SqliteStorage(path) to persist every record for audit, and
+        # CPUOffload(workers) to move extraction and matching off the event loop
+        self.data_hub = DataHub(storage=storage)
+        self.offload = offload or CPUOffload(max_workers=0)
+        self.metrics = ToolMetrics()
         self.mcp_client = MCPClient()
         
         # Initialize MCP servers
@@ -23,6 +27,9 @@ class DocumentVerificationSystem:
         self.credit_server = CreditReportMCPServer(self.data_hub)
         self.coordinator_server = CoordinatorMCPServer(self.data_hub)
         self.supervisor_server = SupervisorMCPServer(self.data_hub)
+        for server in (self.bank_server, self.credit_server, self.coordinator_server, self.supervisor_server):
+            server.offload = self.offload
+            server.metrics = self.metrics
         
         # Register servers with client
         self.mcp_client.register_server(self.bank_server)
@@ -83,6 +90,11 @@ class DocumentVerificationSystem:
         
         return decision
     
+    async def close(self):
+        """Stop the offload workers and flush the Data Hub's pending writes to its storage backend."""
+        await self.offload.close()
+        await self.data_hub.close()
+    
     async def get_server_capabilities(self) -> Dict[str, List[str]]:
         """Get capabilities of all MCP servers."""
         capabilities = {}
@@ -93,6 +105,14 @@ class DocumentVerificationSystem:
         
         return capabilities
     
+    def get_metrics(self) -> Dict[str, Dict[str, Any]]:
+        """Per-tool call metrics for every server, keyed by server then tool."""
+        return self.metrics.snapshot()
+    
+    def prometheus_metrics(self) -> str:
+        """The same metrics in Prometheus text format, for a /metrics endpoint."""
+        return self.metrics.render_prometheus()
+    
     async def get_full_report(self, request_id: str) -> Dict[str, Any]:
         """Get complete report for a request."""
         customer_data = await self.data_hub.get_customer_info(request_id)
@@ -10,12 +10,18 @@ import re
 class MCPServer(ABC):
     """Base class for MCP servers implementing Model Context Protocol."""
     
-    def __init__(self, name: str, data_hub: DataHub):
+    def __init__(self, name: str, data_hub: DataHub, offload: Optional[CPUOffload] = None,
+                 metrics: Optional[ToolMetrics] = None):
         self.name = name
         self.data_hub = data_hub
+        # CPU-heavy tool work runs inline unless a process pool is configured
+        self.offload = offload or CPUOffload(max_workers=0)
+        # Every tool call is timed here; share one registry across servers to scrape them together
+        self.metrics = metrics or ToolMetrics()
         self.tools: Dict[str, Callable] = {}
         self.resources: Dict[str, Any] = {}
         self._register_tools()
+        self.register_tool("get_metrics", self.get_metrics)
     
     @abstractmethod
     def _register_tools(self):
@@ -43,7 +49,7 @@ class MCPServer(ABC):
                         id=request.id
                     )
                 
-                result = await self.tools[tool_name](**tool_params)
+                result = await self.call_tool(tool_name, tool_params)
                 return MCPResponse(result=result, id=request.id)
             
             elif request.method == "resources/list":
@@ -62,6 +68,30 @@ class MCPServer(ABC):
             self.log(f"Error handling request: {e}")
             return MCPResponse(error=str(e), id=request.id)
     
+    async def call_tool(self, tool_name: str, arguments: Dict[str, Any]) -> Any:
+        """Invoke a registered tool directly, without the request/response envelope."""
+        tool = self.tools.get(tool_name)
+        if tool is None:
+            raise ValueError(f"Tool {tool_name} not found")
+        stats = self.metrics.tool(self.name, tool_name)
+        started = stats.begin()
+        failed = False
+        try:
+            return await tool(**arguments)
+        except Exception:
+            failed = True
+            raise
+        finally:
+            stats.end(started, failed)
+    
+    async def get_metrics(self) -> Dict[str, Any]:
+        """Call counts, errors, in-flight calls and latency percentiles for this server's tools."""
+        return self.metrics.snapshot(self.name).get(self.name, {})
+    
+    async def run_cpu(self, fn: Callable, *args) -> Any:
+        """Run CPU-heavy work (a picklable function) through the server's offload executor."""
+        return await self.offload.run(fn, *args)
+    
     def register_tool(self, name: str, func: Callable):
         """Register a tool capability."""
         self.tools[name] = func
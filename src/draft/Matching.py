@@ -0,0 +1,236 @@
+import asyncio
+import json
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, asdict
+from datetime import datetime
+from enum import Enum
+from typing import Dict, List, Optional, Any, Callable
+from difflib import SequenceMatcher
+import os
+import re
+import sys
+
+# ============================================================================
+# NAME / ADDRESS MATCHING
+# ============================================================================
+
+# Names and addresses are canonicalized (and cached) by the document pipeline's
+# normalization module, so both sides share one set of tables and one cache.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "doc_verify"))
+from canonical_forms import canonical_address as canonicalize_address, canonical_forms
+
+
+def canonicalize_name(name: str) -> str:
+    """Canonical form of a single name: lowercase, no punctuation, titles or suffixes."""
+    return canonical_forms.name(name)
+
+
+def canonical_cache_stats() -> Dict[str, Any]:
+    return canonical_forms.stats()
+
+
+def _align_given(token1: str, token2: str):
+    """An initial matches any name starting with it ("m" ~ "michael")."""
+    if len(token1) == 1 and token2.startswith(token1):
+        return token1, token1
+    if len(token2) == 1 and token1.startswith(token2):
+        return token2, token2
+    return token1, token2
+
+
+def align_names(name1: str, name2: str):
+    """
+    Canonicalizes two names against each other. Middle names are dropped when
+    only one side has them, and names are reduced to initials where the other
+    side only gives an initial, so "John M. Smith", "John Michael Smith" and
+    "John Smith" all compare equal.
+    """
+    tokens1, tokens2 = canonical_forms.name_tokens(name1), canonical_forms.name_tokens(name2)
+    if len(tokens1) < 2 or len(tokens2) < 2:
+        return " ".join(tokens1), " ".join(tokens2)
+
+    first1, first2 = _align_given(tokens1[0], tokens2[0])
+    middle1, middle2 = tokens1[1:-1], tokens2[1:-1]
+    if not middle1 or not middle2:
+        middle1, middle2 = [], []
+    elif len(middle1) != len(middle2):
+        middle1, middle2 = [middle1[0][0]], [middle2[0][0]]
+    else:
+        pairs = [_align_given(m1, m2) for m1, m2 in zip(middle1, middle2)]
+        middle1, middle2 = [p[0] for p in pairs], [p[1] for p in pairs]
+    return (" ".join([first1, *middle1, tokens1[-1]]),
+            " ".join([first2, *middle2, tokens2[-1]]))
+
+
+def bounded_edit_distance(s1: str, s2: str, max_distance: int) -> int:
+    """
+    Levenshtein distance using the bit-parallel Myers/Hyyro algorithm (one
+    pass over s2, a handful of integer ops per character). Stops as soon as
+    the distance is known to exceed max_distance and then returns
+    max_distance + 1.
+    """
+    if s1 == s2:
+        return 0
+    if len(s1) > len(s2):
+        s1, s2 = s2, s1
+    m, n = len(s1), len(s2)
+    if n - m > max_distance:
+        return max_distance + 1
+    if m == 0:
+        return n
+
+    peq: Dict[str, int] = {}
+    for i, char in enumerate(s1):
+        peq[char] = peq.get(char, 0) | (1 << i)
+    mask = (1 << m) - 1
+    last = 1 << (m - 1)
+    pv, mv, score = mask, 0, m
+
+    for j, char in enumerate(s2):
+        eq = peq.get(char, 0)
+        xv = eq | mv
+        xh = (((eq & pv) + pv) ^ pv) | eq
+        ph = mv | ~(xh | pv)
+        mh = pv & xh
+        if ph & last:
+            score += 1
+        elif mh & last:
+            score -= 1
+        # The score moves by at most one per remaining column.
+        if score - (n - j - 1) > max_distance:
+            return max_distance + 1
+        ph = (ph << 1) | 1
+        mh = mh << 1
+        pv = (mh | ~(xv | ph)) & mask
+        mv = ph & xv & mask
+    return score if score <= max_distance else max_distance + 1
+
+
+def bounded_similarity(s1: str, s2: str, min_score: float = 0.0) -> float:
+    """
+    Normalized edit similarity, 1 - distance / longest length. When the score
+    cannot reach min_score the computation stops early and returns 0.0, so a
+    thresholded score never overstates a mismatch; pass min_score=0.0 when the
+    exact value is needed (e.g. for a confidence score).
+    """
+    if s1 == s2:
+        return 1.0
+    longest = max(len(s1), len(s2))
+    max_distance = int((1.0 - min_score) * longest + 1e-9)
+    distance = bounded_edit_distance(s1, s2, max_distance)
+    return 1.0 - distance / longest if distance <= max_distance else 0.0
+
+
+def name_similarity(name1: str, name2: str, min_score: float = 0.0) -> float:
+    """Similarity of two person names, tolerant of initials and missing middle names."""
+    canonical1, canonical2 = align_names(name1, name2)
+    return bounded_similarity(canonical1, canonical2, min_score)
+
+
+def address_similarity(addr1: str, addr2: str, min_score: float = 0.0) -> float:
+    """
+    Similarity of two canonicalized addresses. Falls back to a token-set
+    comparison so reordered components ("Apt 4B, 123 Main St") still score.
+    """
+    (canonical1, sorted1), (canonical2, sorted2) = canonical_forms.address_forms(addr1), canonical_forms.address_forms(addr2)
+    score = bounded_similarity(canonical1, canonical2, min_score)
+    if score < 1.0:
+        score = max(score, bounded_similarity(sorted1, sorted2, max(min_score, score)))
+    return score
+
+
+def score_customer_pair(name1: str, name2: str, addr1: str, addr2: str,
+                        name_min_score: float = 0.0, address_min_score: float = 0.0) -> tuple:
+    """(name similarity, address similarity) in one call, so offloading it costs a single round trip."""
+    return name_similarity(name1, name2, name_min_score), address_similarity(addr1, addr2, address_min_score)
+
+
+def text_similarity(str1: str, str2: str, min_score: float = 0.0) -> float:
+    """Similarity of two free-text strings, ignoring case and repeated whitespace."""
+    return bounded_similarity(" ".join(str1.lower().split()), " ".join(str2.lower().split()), min_score)
+
+
+def classify_similarity(similarity: float, exact_threshold: float, partial_threshold: float) -> "MatchResult":
+    if similarity >= exact_threshold:
+        return MatchResult.EXACT_MATCH
+    elif similarity >= partial_threshold:
+        return MatchResult.PARTIAL_MATCH
+    else:
+        return MatchResult.MISMATCH
+
+
+# ============================================================================
+# BENCHMARK: python Matching.py [pair_count]
+# ============================================================================
+
+def _synthetic_pairs(count: int, seed: int = 7):
+    import random
+    rng = random.Random(seed)
+    first = ["John", "Mary", "Robert", "Patricia", "Michael", "Linda", "David", "Susan"]
+    middle = ["Michael", "Ann", "James", "Lee", "Marie", ""]
+    last = ["Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", "Miller", "Davis"]
+    streets = ["Main", "Oak", "Pine", "Maple", "Cedar", "Elm", "Washington", "Lake"]
+    suffixes = [("Street", "St"), ("Avenue", "Ave"), ("Road", "Rd"), ("Boulevard", "Blvd")]
+    states = [("New York", "NY"), ("California", "CA"), ("Texas", "TX"), ("Florida", "FL")]
+
+    def typo(text):
+        i = rng.randrange(len(text))
+        return text[:i] + rng.choice("abcdefghijklmnopqrstuvwxyz") + text[i + 1:]
+
+    pairs = []
+    for _ in range(count):
+        f, m, l = rng.choice(first), rng.choice(middle), rng.choice(last)
+        number, street = rng.randint(1, 9999), rng.choice(streets)
+        suffix_long, suffix_short = rng.choice(suffixes)
+        state_long, state_short = rng.choice(states)
+        unit = rng.choice(["", f"{rng.randint(1, 20)}{rng.choice('ABCD')}"])
+        name1 = f"{f} {m} {l}".replace("  ", " ")
+        address1 = f"{number} {street} {suffix_long}" + (f" Apartment {unit}" if unit else "") + f", {state_long}"
+        kind = rng.random()
+        if kind < 0.5: # same person, abbreviated forms
+            name2 = f"{f} {m[:1] + '.' if m else ''} {l}".replace("  ", " ")
+            address2 = f"{number} {street} {suffix_short}" + (f", Apt {unit}" if unit else "") + f", {state_short}"
+        elif kind < 0.8: # typos
+            name2, address2 = typo(name1), typo(address1)
+        else: # different person
+            name2 = f"{rng.choice(first)} {rng.choice(last)}"
+            address2 = f"{rng.randint(1, 9999)} {rng.choice(streets)} {suffix_short}, {state_short}"
+        pairs.append((name1, name2, address1, address2))
+    return pairs
+
+
+def _benchmark(count: int = 100_000):
+    import time
+
+    def sequence_matcher(s1, s2):
+        return SequenceMatcher(None, s1.lower(), s2.lower()).ratio()
+
+    pairs = _synthetic_pairs(count)
+
+    started = time.perf_counter()
+    baseline = [(classify_similarity(sequence_matcher(n1, n2), 0.95, 0.75),
+                 classify_similarity(sequence_matcher(a1, a2), 0.90, 0.70)) for n1, n2, a1, a2 in pairs]
+    baseline_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    matched = [(classify_similarity(name_similarity(n1, n2, 0.75), 0.95, 0.75),
+                classify_similarity(address_similarity(a1, a2, 0.70), 0.90, 0.70)) for n1, n2, a1, a2 in pairs]
+    matched_seconds = time.perf_counter() - started
+
+    def exact_rate(results):
+        return sum(name == MatchResult.EXACT_MATCH and address == MatchResult.EXACT_MATCH
+                   for name, address in results) / len(results)
+
+    print(f"{count} name/address pairs")
+    print(f"  SequenceMatcher : {baseline_seconds:.2f}s ({count / baseline_seconds:,.0f} pairs/s), "
+          f"exact on both fields {exact_rate(baseline):.1%}")
+    print(f"  Matching engine : {matched_seconds:.2f}s ({count / matched_seconds:,.0f} pairs/s), "
+          f"exact on both fields {exact_rate(matched):.1%}")
+    print(f"  Speedup         : {baseline_seconds / matched_seconds:.1f}x")
+
+
+if __name__ == "__main__":
+    import sys
+    from DataModel import MatchResult
+
+    _benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
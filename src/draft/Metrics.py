@@ -0,0 +1,133 @@
+import asyncio
+import json
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, asdict
+from datetime import datetime
+from enum import Enum
+from typing import Dict, List, Optional, Any, Callable
+from difflib import SequenceMatcher
+import re
+import bisect
+import time
+
+# ============================================================================
+# TOOL METRICS
+# ============================================================================
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram; percentiles are interpolated inside a bucket."""
+
+    # Upper bounds in seconds (the Prometheus "le" labels); the last bucket is +Inf
+    BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+               0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    __slots__ = ("counts", "count", "sum", "max")
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float):
+        self.counts[bisect.bisect_left(self.BUCKETS, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, fraction: float) -> float:
+        rank = fraction * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                if index == len(self.BUCKETS):
+                    return self.max
+                lower = self.BUCKETS[index - 1] if index else 0.0
+                upper = min(self.BUCKETS[index], self.max)
+                return lower + (upper - lower) * max(0.0, rank - seen) / count
+            seen += count
+        return self.max
+
+
+class ToolStats:
+    """Calls, errors, in-flight gauge and latency histogram for one tool."""
+
+    __slots__ = ("calls", "errors", "in_flight", "latency")
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.in_flight = 0
+        self.latency = LatencyHistogram()
+
+    def begin(self) -> float:
+        self.calls += 1
+        self.in_flight += 1
+        return time.perf_counter()
+
+    def end(self, started: float, failed: bool = False):
+        self.in_flight -= 1
+        if failed:
+            self.errors += 1
+        self.latency.observe(time.perf_counter() - started)
+
+    def snapshot(self) -> Dict[str, Any]:
+        latency = self.latency
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "in_flight": self.in_flight,
+            "mean_ms": latency.sum / latency.count * 1000 if latency.count else 0.0,
+            "p50_ms": latency.percentile(0.50) * 1000,
+            "p95_ms": latency.percentile(0.95) * 1000,
+            "p99_ms": latency.percentile(0.99) * 1000,
+            "max_ms": latency.max * 1000,
+        }
+
+
+class ToolMetrics:
+    """
+    Per-tool call metrics keyed by (server, tool). One registry can be shared
+    by every server in the system so a single Prometheus scrape covers them all.
+    """
+
+    def __init__(self, namespace: str = "mcp"):
+        self.namespace = namespace
+        self._stats: Dict[tuple, ToolStats] = {}
+
+    def tool(self, server: str, tool: str) -> ToolStats:
+        stats = self._stats.get((server, tool))
+        if stats is None:
+            stats = self._stats[(server, tool)] = ToolStats()
+        return stats
+
+    def snapshot(self, server: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+        """{server: {tool: stats}}, optionally for one server only."""
+        result: Dict[str, Dict[str, Any]] = {}
+        for (server_name, tool), stats in self._stats.items():
+            if server is None or server_name == server:
+                result.setdefault(server_name, {})[tool] = stats.snapshot()
+        return result
+
+    def render_prometheus(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)."""
+        prefix = f"{self.namespace}_tool"
+        series = [(f'server="{server}",tool="{tool}"', stats) for (server, tool), stats in sorted(self._stats.items())]
+        lines = []
+        for suffix, metric_type, value in (("calls_total", "counter", lambda stats: stats.calls),
+                                           ("errors_total", "counter", lambda stats: stats.errors),
+                                           ("in_flight", "gauge", lambda stats: stats.in_flight)):
+            lines.append(f"# TYPE {prefix}_{suffix} {metric_type}")
+            lines.extend(f"{prefix}_{suffix}{{{labels}}} {value(stats)}" for labels, stats in series)
+        name = f"{prefix}_duration_seconds"
+        lines.append(f"# TYPE {name} histogram")
+        for labels, stats in series:
+            cumulative = 0
+            for bound, count in zip(LatencyHistogram.BUCKETS, stats.latency.counts):
+                cumulative += count
+                lines.append(f'{name}_bucket{{{labels},le="{bound:g}"}} {cumulative}')
+            lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {stats.latency.count}')
+            lines.append(f"{name}_sum{{{labels}}} {stats.latency.sum!r}")
+            lines.append(f"{name}_count{{{labels}}} {stats.latency.count}")
+        return "\n".join(lines) + "\n"
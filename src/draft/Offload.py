@@ -0,0 +1,166 @@
+import asyncio
+import json
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, asdict
+from datetime import datetime
+from enum import Enum
+from typing import Dict, List, Optional, Any, Callable
+from difflib import SequenceMatcher
+import re
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+# ============================================================================
+# CPU OFFLOAD
+# ============================================================================
+
+def _warm_worker(delay: float) -> int:
+    # Holding each task briefly makes the pool start every worker process
+    time.sleep(delay)
+    return os.getpid()
+
+
+def _apply_chunk(fn: Callable, chunk: List[tuple]) -> List[Any]:
+    return [fn(*args) for args in chunk]
+
+
+class CPUOffload:
+    """
+    Runs CPU-heavy work (extraction, similarity scoring) in a process pool so
+    the event loop keeps serving other requests. With max_workers=0 work runs
+    inline on the loop, which is the default for servers that don't opt in.
+    Functions and arguments must be picklable: use module-level functions or
+    methods of plain objects, never of servers holding the Data Hub.
+    """
+
+    DEFAULT_WORKERS = os.cpu_count() or 1
+    # Small items are sent in chunks so one IPC round trip carries many of them
+    CHUNKS_PER_WORKER = 4
+
+    def __init__(self, max_workers: int = DEFAULT_WORKERS):
+        self.max_workers = max_workers
+        self._pool: Optional[ProcessPoolExecutor] = None
+        # Metrics
+        self.tasks = 0
+        self.items = 0
+        self.busy_seconds = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_workers > 0
+
+    async def start(self):
+        """Start and warm every worker so the first requests don't pay process start-up."""
+        if not self.enabled or self._pool is not None:
+            return
+        self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(self._pool, _warm_worker, 0.05)
+                               for _ in range(self.max_workers)))
+
+    async def run(self, fn: Callable, *args) -> Any:
+        """Run fn(*args) in a worker process (or inline when disabled)."""
+        self.tasks += 1
+        self.items += 1
+        if not self.enabled:
+            return fn(*args)
+        if self._pool is None:
+            await self.start()
+        started = time.perf_counter()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._pool, fn, *args)
+        finally:
+            self.busy_seconds += time.perf_counter() - started
+
+    async def map(self, fn: Callable, items: List[tuple], chunk_size: Optional[int] = None) -> List[Any]:
+        """fn(*item) for every item, in order, spread over the workers in chunks."""
+        if not items:
+            return []
+        if not self.enabled:
+            self.tasks += 1
+            self.items += len(items)
+            return _apply_chunk(fn, items)
+        if chunk_size is None:
+            chunk_size = -(-len(items) // (self.max_workers * self.CHUNKS_PER_WORKER))
+        chunks = [items[i:i + chunk_size] for i in range(0, len(items), chunk_size)]
+        results = await asyncio.gather(*(self.run(_apply_chunk, fn, chunk) for chunk in chunks))
+        self.items += len(items) - len(chunks)
+        return [result for chunk_results in results for result in chunk_results]
+
+    async def close(self):
+        if self._pool is not None:
+            pool, self._pool = self._pool, None
+            await asyncio.to_thread(pool.shutdown)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "max_workers": self.max_workers,
+            "tasks": self.tasks,
+            "items": self.items,
+            "busy_seconds": self.busy_seconds,
+        }
+
+
+# ============================================================================
+# BENCHMARK: python Offload.py [workers]
+# ============================================================================
+
+def _benchmark(workers: int = CPUOffload.DEFAULT_WORKERS, documents: int = 200, pairs: int = 50_000):
+    """
+    Event-loop lag (how late a 5ms ticker wakes up) while large statements are
+    extracted one tool call at a time and a batch of address pairs is scored,
+    with the work inline on the loop and offloaded to the pool.
+    """
+    from Extraction import ExtractionEngine, FieldSpec, NAME_PATTERN, ADDRESS_PATTERN, _statement
+    from Matching import address_similarity, _synthetic_pairs
+
+    engine = ExtractionEngine([
+        FieldSpec("name", "Name", validate=NAME_PATTERN),
+        FieldSpec("address", "Address", multiline=True, stop_at=("Account",), validate=ADDRESS_PATTERN),
+    ])
+    # Header after the transactions, so every document is scanned end to end
+    text = _statement(400, header_last=True)
+    address_pairs = [(a1, a2, 0.70) for _, _, a1, a2 in _synthetic_pairs(pairs)]
+
+    async def run(offload):
+        await offload.start()
+        lags = []
+        done = asyncio.Event()
+
+        async def ticker():
+            while not done.is_set():
+                started = time.perf_counter()
+                await asyncio.sleep(0.005)
+                lags.append(time.perf_counter() - started - 0.005)
+
+        async def extract(_):
+            return await offload.run(engine.extract, text)
+
+        tick = asyncio.create_task(ticker())
+        await asyncio.sleep(0.02)
+        started = time.perf_counter()
+        await asyncio.gather(*(extract(i) for i in range(documents)))
+        extract_seconds = time.perf_counter() - started
+        started = time.perf_counter()
+        await offload.map(address_similarity, address_pairs)
+        match_seconds = time.perf_counter() - started
+        done.set()
+        await tick
+        await offload.close()
+        lags.sort()
+        return extract_seconds, match_seconds, lags[len(lags) // 2], lags[int(len(lags) * 0.99)], lags[-1]
+
+    print(f"{documents} extractions of a {len(text) / 1024:.0f} KiB statement, then {pairs} address pairs")
+    for label, offload in (("inline", CPUOffload(0)), (f"{workers} workers", CPUOffload(workers))):
+        extract_seconds, match_seconds, p50, p99, worst = asyncio.run(run(offload))
+        print(f"  {label:<10}: extraction {documents / extract_seconds:,.0f} docs/s, "
+              f"matching {pairs / match_seconds:,.0f} pairs/s; loop lag p50 {p50 * 1000:.1f}ms, "
+              f"p99 {p99 * 1000:.1f}ms, max {worst * 1000:.1f}ms")
+
+
+if __name__ == "__main__":
+    import sys
+
+    _benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else CPUOffload.DEFAULT_WORKERS)
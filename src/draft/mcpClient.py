@@ -7,47 +7,144 @@ from enum import Enum
 from typing import Dict, List, Optional, Any, Callable
 from difflib import SequenceMatcher
 import re
+import itertools
 class MCPClient:
     """Client for communicating with MCP servers."""
     
-    def __init__(self):
+    def __init__(self, direct_dispatch: bool = True):
         self.servers: Dict[str, MCPServer] = {}
-        self.request_counter = 0
+        # next() on a count is atomic, so ids stay unique across concurrent calls
+        self._request_ids = itertools.count(1)
+        # In-process servers are called directly, skipping the MCPRequest/MCPResponse envelope
+        self.direct_dispatch = direct_dispatch
     
-    def register_server(self, server: MCPServer):
+    def _next_request_id(self, prefix: str = "req") -> str:
+        return f"{prefix}-{next(self._request_ids)}"
+    
+    def register_server(self, server: "MCPServer"):
         """Register an MCP server."""
         self.servers[server.name] = server
         print(f"[MCPClient] Registered server: {server.name}")
     
+    def _get_server(self, server_name: str) -> "MCPServer":
+        server = self.servers.get(server_name)
+        if server is None:
+            raise ValueError(f"Server {server_name} not found")
+        return server
+    
     async def call_tool(self, server_name: str, tool_name: str, **kwargs) -> Any:
         """Call a tool on a specific MCP server."""
-        if server_name not in self.servers:
-            raise ValueError(f"Server {server_name} not found")
+        server = self._get_server(server_name)
+        
+        # Fast path: servers that use the stock request handler are invoked directly
+        if self.direct_dispatch and type(server).handle_request is MCPServer.handle_request:
+            try:
+                return await server.call_tool(tool_name, kwargs)
+            except Exception as e:
+                server.log(f"Error handling request: {e}")
+                raise Exception(f"MCP Error: {e}") from e
         
-        self.request_counter += 1
         request = MCPRequest(
             method="tools/call",
             params={"name": tool_name, "arguments": kwargs},
-            id=f"req-{self.request_counter}"
+            id=self._next_request_id()
         )
         
-        response = await self.servers[server_name].handle_request(request)
+        response = await server.handle_request(request)
         
         if response.error:
             raise Exception(f"MCP Error: {response.error}")
         
         return response.result
     
+    async def call_tools_batch(self, server_name: str, calls: List[tuple],
+                               return_exceptions: bool = False) -> List[Any]:
+        """
+        Run several (tool_name, kwargs) calls on one server concurrently and
+        return their results in order. With return_exceptions, a failed call
+        yields its exception instead of failing the whole batch.
+        """
+        self._get_server(server_name)
+        return await asyncio.gather(*(self.call_tool(server_name, tool_name, **kwargs) for tool_name, kwargs in calls),
+                                    return_exceptions=return_exceptions)
+    
     async def list_tools(self, server_name: str) -> List[str]:
         """List available tools on a server."""
-        if server_name not in self.servers:
-            raise ValueError(f"Server {server_name} not found")
+        server = self._get_server(server_name)
         
         request = MCPRequest(
             method="tools/list",
             params={},
-            id=f"req-list-{self.request_counter}"
+            id=self._next_request_id("req-list")
         )
         
-        response = await self.servers[server_name].handle_request(request)
+        response = await server.handle_request(request)
         return response.result.get("tools", [])
+
+
+# ============================================================================
+# OVERHEAD BENCHMARK: python mcpClient.py [calls]
+# ============================================================================
+
+def _benchmark(calls: int = 100_000, batch_size: int = 100, io_calls: int = 2000, io_seconds: float = 0.001):
+    """
+    Per-call overhead of the envelope path, direct dispatch and batched calls
+    on a no-op tool, then the same on a tool that waits on I/O.
+    """
+    import contextlib
+    import io
+    import os
+    import time
+    
+    # The draft modules are fragments of one program; assemble the pieces this benchmark needs.
+    namespace = {"__name__": "mcp_benchmark"}
+    directory = os.path.dirname(os.path.abspath(__file__))
+    for fragment in ("DataModel.py", "Offload.py", "DataHubStorage.py", "DataHub.py", "Metrics.py", "IMCPServer.py",
+                     "mcpClient.py"):
+        with open(os.path.join(directory, fragment)) as f:
+            exec(compile(f.read(), fragment, "exec"), namespace)
+    
+    class EchoServer(namespace["MCPServer"]):
+        def __init__(self):
+            super().__init__("EchoServer", namespace["DataHub"]())
+        
+        def _register_tools(self):
+            self.register_tool("echo", self.echo)
+            self.register_tool("wait", self.wait)
+        
+        async def echo(self, value: int) -> int:
+            return value
+        
+        async def wait(self, value: int) -> int:
+            await asyncio.sleep(io_seconds)
+            return value
+    
+    async def run(client, tool_name, count, batched):
+        started = time.perf_counter()
+        if batched:
+            for start in range(0, count, batch_size):
+                calls_in_batch = [(tool_name, {"value": i}) for i in range(start, min(start + batch_size, count))]
+                await client.call_tools_batch("EchoServer", calls_in_batch)
+        else:
+            for i in range(count):
+                await client.call_tool("EchoServer", tool_name, value=i)
+        return time.perf_counter() - started
+    
+    for tool_name, count, title in (("echo", calls, f"{calls} calls to a no-op tool"),
+                                    ("wait", io_calls, f"{io_calls} calls to a tool awaiting {io_seconds * 1000:.0f}ms of I/O")):
+        print(title)
+        baseline = None
+        for label, direct, batched in (("envelope (before)", False, False), ("direct dispatch", True, False),
+                                       (f"batches of {batch_size}", True, True)):
+            with contextlib.redirect_stdout(io.StringIO()):
+                client = namespace["MCPClient"](direct_dispatch=direct)
+                client.register_server(EchoServer())
+                seconds = asyncio.run(run(client, tool_name, count, batched))
+            baseline = baseline or seconds
+            print(f"  {label:<18}: {seconds / count * 1e6:8.2f}us/call ({baseline / seconds:.1f}x)")
+
+
+if __name__ == "__main__":
+    import sys
+    
+    _benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)